@@ -5,7 +5,7 @@ from ..crud import user as user_crud
 from ..crud import badge as badge_crud
 from bson.errors import InvalidId
 from bson import ObjectId
-from datetime import datetime
+from ..database import utc_now
 
 router = APIRouter()
 
@@ -105,7 +105,7 @@ async def add_badge(
             )
         
         # Get badge by level
-        all_badges = await badge_crud.get_badges()
+        all_badges = await badge_crud.get_badges_cached()
         badge_to_assign = next((b for b in all_badges if b.get("level") == badge_level), None)
         
         if not badge_to_assign:
@@ -143,7 +143,7 @@ async def add_badge(
                     {"user_id": user_id},
                     {"$set": {
                         "total_reports": required_reports,
-                        "updated_at": datetime.utcnow()
+                        "updated_at": utc_now()
                     }}
                 )
         else:
@@ -160,7 +160,7 @@ async def add_badge(
                 "user_id": user_id,
                 "total_reports": required_reports,
                 "badges_earned": [badge_to_assign["id"]],
-                "updated_at": datetime.utcnow()
+                "updated_at": utc_now()
             })
             
         return {
@@ -1,6 +1,7 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends, Path, Query, Body
 from typing import Dict, Any, List
-from datetime import datetime
+from ..database import utc_now
 from ..models import CityStats, CityLeaderboard, UpdateCityRequest
 from ..crud import city as city_crud
 from ..crud import user as user_crud
@@ -44,12 +45,12 @@ async def update_user_city(
         
         updated_user = await user_crud.update_user(user_id, user_data)
         
-        # Update city stats - decrement old city if exists
+        # Update city stats - increment new city user count and decrement
+        # old city if exists; the two cities are updated concurrently
+        city_updates = [city_crud.increment_city_users(new_city)]
         if old_city and old_city != new_city:
-            await city_crud.increment_city_users(old_city, -1)
-            
-        # Increment new city user count
-        await city_crud.increment_city_users(new_city)
+            city_updates.append(city_crud.increment_city_users(old_city, -1))
+        await asyncio.gather(*city_updates)
         
         return {
             "message": f"City updated to {new_city}",
@@ -112,16 +113,13 @@ async def get_city_leaderboard(
     2. Citizen responsibility (engagement and reporting)
     """
     try:
-        # Get all ranked cities
-        ranked_cities = await city_crud.get_city_leaderboard()
-        
-        # Limit to requested number of cities
-        limited_cities = ranked_cities[:limit]
+        # Get the top ranked cities
+        limited_cities = await city_crud.get_city_leaderboard(limit=limit)
         
         # Add explanatory information about the scoring
         response = {
             "cities": limited_cities,
-            "last_updated": datetime.utcnow(),
+            "last_updated": utc_now(),
             "scoring_explanation": {
                 "authority_score": "50% of total - Measures municipal responsiveness and resolution efficiency",
                 "citizen_score": "50% of total - Measures citizen engagement and responsible reporting",
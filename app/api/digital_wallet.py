@@ -204,7 +204,7 @@ async def redeem_benefit(
             "message": f"Successfully redeemed {benefit['name']}",
             "transaction_id": transaction["id"],
             "coins_used": benefit["coins_required"],
-            "remaining_balance": wallet["balance"] - benefit["coins_required"],
+            "remaining_balance": transaction["remaining_balance"],
             "validity_days": benefit["validity_days"]
         }
         
@@ -215,6 +215,18 @@ async def redeem_benefit(
             status_code=400,
             detail=f"Invalid user ID format: {user_id}"
         )
+    except LookupError as e:
+        # Wallet deleted between the check above and the atomic deduction
+        raise HTTPException(
+            status_code=404,
+            detail=str(e)
+        )
+    except ValueError as e:
+        # Balance changed between the check above and the atomic deduction
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
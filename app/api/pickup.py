@@ -35,6 +35,29 @@ async def schedule_pickup(
             detail=f"Error scheduling pickup: {str(e)}"
         )
 
+@router.post("/schedule/batch", 
+    response_model=List[PickupRequest],
+    summary="Schedule several pickups",
+    description="Schedule multiple waste pickup requests in a single call"
+)
+async def schedule_pickups_batch(
+    pickup_requests: List[PickupRequest] = Body(..., description="Pickup request details")
+):
+    """
+    Schedule multiple waste pickup requests
+    """
+    try:
+        # Prepare pickup data
+        pickups_data = [pickup_request.dict(exclude_unset=True) for pickup_request in pickup_requests]
+        
+        # Schedule all pickups in one database call
+        return await pickup_crud.schedule_pickups_bulk(pickups_data)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error scheduling pickups: {str(e)}"
+        )
+
 @router.get("/all", 
     response_model=List[PickupRequest],
     summary="Get all pickups",
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from typing import Dict, Any
-import base64
+import pybase64 as base64
 from ..services.waste_categorization_service import analyze_waste_image
 import logging
 
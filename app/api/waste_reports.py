@@ -1,22 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, Path, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, UploadFile, File, Response
 from typing import List, Optional
 from ..auth.router import get_optional_authority
 from ..crud import waste_report as waste_report_crud
-from ..models import WasteReport, WasteReportStatus, CleanupVerificationResponse
+from ..models import WasteReport, WasteReportList, WasteReportSummaryList, WasteReportStatus, CleanupVerificationResponse
 from bson.errors import InvalidId
-from datetime import datetime
 import json
 from ..config import get_settings
-import base64
+import pybase64 as base64
 from ..services.gemini_service import compare_cleanup_images
 from bson.objectid import ObjectId
-from ..database import get_database
-from datetime import datetime  # Ensure datetime is imported
+from ..database import get_database, to_object_id, utc_now
+from ..responses import ORJSONResponse
+import logging
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+def parse_report_id(report_id: str = Path(..., description="The ID of the waste report")) -> ObjectId:
+    """
+    Parse the report ID path parameter once, rejecting malformed IDs with a 400
+    before any handler or database work
+    """
+    try:
+        return to_object_id(report_id)
+    except InvalidId:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid report ID format: {report_id}"
+        )
+
 @router.get("/reports")
 async def get_waste_reports(
     skip: int = Query(0, ge=0),
@@ -24,6 +38,8 @@ async def get_waste_reports(
     severity: Optional[str] = Query(None, description="Filter by severity (Medium, High, Critical)"),
     status: Optional[str] = Query(None, description="Filter by status (pending, in_progress, resolved)"),
     location: Optional[str] = Query(None, description="Text search in location field"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; faster than skip for deep pages"),
+    summary: bool = Query(False, description="Return only severity, status, location, time and waste types for each report"),
     current_authority: Optional[dict] = Depends(get_optional_authority)
 ):
     """
@@ -33,21 +49,45 @@ async def get_waste_reports(
     Results are sorted by creation date (newest first).
     """
     try:
-        reports = await waste_report_crud.get_waste_reports(
-            skip=skip,
-            limit=limit,
-            severity=severity,
-            status=status,
-            location_query=location
-        )
+        try:
+            reports = await waste_report_crud.get_waste_reports(
+                skip=skip,
+                limit=limit,
+                severity=severity,
+                status=status,
+                location_query=location,
+                projection=waste_report_crud.REPORT_SUMMARY_PROJECTION if summary else waste_report_crud.REPORT_WITHOUT_IMAGE,
+                after=cursor
+            )
+        except ValueError as e:
+            # Malformed pagination cursor
+            raise HTTPException(
+                status_code=400,
+                detail=str(e)
+            )
         
-        # Convert reports to Pydantic models for proper serialization
-        serialized_reports = [WasteReport.from_mongo(report) for report in reports]
+        # Cursor for the next page, taken from the last report before serialization
+        next_cursor = None
+        if len(reports) == limit:
+            next_cursor = waste_report_crud.encode_report_cursor(reports[-1])
         
-        return {
+        # Convert reports to Pydantic models for proper serialization; dumped by
+        # alias to keep the "_id" key the default encoder produced
+        if summary:
+            serialized_reports = WasteReportSummaryList.dump_python(
+                WasteReportSummaryList.validate_python(reports),
+                by_alias=True
+            )
+        else:
+            serialized_reports = WasteReportList.dump_python(WasteReport.load_many(reports), by_alias=True)
+        
+        return ORJSONResponse({
             "count": len(serialized_reports),
-            "results": serialized_reports
-        }
+            "results": serialized_reports,
+            "next_cursor": next_cursor
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -56,14 +96,14 @@ async def get_waste_reports(
 
 @router.get("/reports/{report_id}", response_model=WasteReport)
 async def get_waste_report(
-    report_id: str = Path(..., description="The ID of the waste report"),
+    report_id: ObjectId = Depends(parse_report_id),
     current_authority: Optional[dict] = Depends(get_optional_authority)
 ):
     """
     Get a specific waste report by ID
     """
     try:
-        report = await waste_report_crud.get_waste_report(report_id)
+        report = await waste_report_crud.get_waste_report(report_id, waste_report_crud.REPORT_WITHOUT_IMAGE)
         if not report:
             raise HTTPException(
                 status_code=404,
@@ -71,23 +111,57 @@ async def get_waste_report(
             )
             
         # Convert to Pydantic model for proper serialization
-        return WasteReport.from_mongo(report)
-    except InvalidId:
+        return ORJSONResponse(WasteReport.from_mongo(report).model_dump(by_alias=True))
+    except HTTPException:
+        raise
+    except Exception as e:
         raise HTTPException(
-            status_code=400,
-            detail=f"Invalid report ID format: {report_id}"
+            status_code=500,
+            detail=f"Error retrieving waste report: {str(e)}"
         )
+
+def _image_media_type(image_bytes: bytes) -> str:
+    """Guess an image's media type from its leading bytes"""
+    if image_bytes.startswith(b"\x89PNG"):
+        return "image/png"
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    if image_bytes.startswith(b"GIF8"):
+        return "image/gif"
+    return "image/jpeg"
+
+@router.get("/reports/{report_id}/image")
+async def get_waste_report_image(
+    report_id: ObjectId = Depends(parse_report_id),
+    current_authority: Optional[dict] = Depends(get_optional_authority)
+):
+    """
+    Get the image of a waste report as raw image bytes
+    
+    Report listings and details leave the image out; clients fetch it here when needed.
+    """
+    try:
+        report = await waste_report_crud.get_waste_report(report_id, {"image": 1})
+        if not report or not report.get("image"):
+            raise HTTPException(
+                status_code=404,
+                detail=f"Image for waste report with ID {report_id} not found"
+            )
+        
+        # Images submitted as data URLs are stored with their "data:...;base64," prefix
+        image_bytes = base64.b64decode(report["image"].rpartition("base64,")[2])
+        return Response(content=image_bytes, media_type=_image_media_type(image_bytes))
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Error retrieving waste report: {str(e)}"
+            detail=f"Error retrieving waste report image: {str(e)}"
         )
 
 @router.patch("/reports/{report_id}", response_model=WasteReport)
 async def update_report_status(
-    report_id: str = Path(..., description="The ID of the waste report"),
+    report_id: ObjectId = Depends(parse_report_id),
     status: str = Query(..., description="New status (pending, in_progress, resolved)"),
     current_authority: Optional[dict] = Depends(get_optional_authority)
 ):
@@ -112,11 +186,6 @@ async def update_report_status(
             
         # Convert to Pydantic model for proper serialization
         return WasteReport.from_mongo(updated_report)
-    except InvalidId:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid report ID format: {report_id}"
-        )
     except HTTPException:
         raise
     except Exception as e:
@@ -127,7 +196,7 @@ async def update_report_status(
 
 @router.post("/reports/{report_id}/comments", response_model=WasteReport)
 async def add_report_comment(
-    report_id: str = Path(..., description="The ID of the waste report"),
+    report_id: ObjectId = Depends(parse_report_id),
     comment: str = Query(..., description="Comment text"),
     current_authority: Optional[dict] = Depends(get_optional_authority)
 ):
@@ -152,11 +221,6 @@ async def add_report_comment(
             
         # Convert to Pydantic model for proper serialization
         return WasteReport.from_mongo(updated_report)
-    except InvalidId:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid report ID format: {report_id}"
-        )
     except HTTPException:
         raise
     except Exception as e:
@@ -167,7 +231,7 @@ async def add_report_comment(
 
 @router.delete("/reports/{report_id}")
 async def delete_waste_report(
-    report_id: str = Path(..., description="The ID of the waste report"),
+    report_id: ObjectId = Depends(parse_report_id),
     current_authority: Optional[dict] = Depends(get_optional_authority)
 ):
     """
@@ -188,11 +252,6 @@ async def delete_waste_report(
                 detail=f"Waste report with ID {report_id} not found"
             )
         return {"message": f"Waste report with ID {report_id} deleted successfully"}
-    except InvalidId:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid report ID format: {report_id}"
-        )
     except HTTPException:
         raise
     except Exception as e:
@@ -203,7 +262,7 @@ async def delete_waste_report(
 
 @router.post("/reports/{report_id}/verify-cleanup", response_model=CleanupVerificationResponse)
 async def verify_cleanup(
-    report_id: str,
+    report_id: ObjectId = Depends(parse_report_id),
     after_image: UploadFile = File(...),
     current_authority: Optional[dict] = Depends(get_optional_authority)
 ):
@@ -212,16 +271,13 @@ async def verify_cleanup(
     Returns simplified response with verification status and key information.
     """
     try:
-        # Get the original report
-        report_data = await waste_report_crud.get_waste_report(report_id)
+        # Get the original report's image
+        report_data = await waste_report_crud.get_waste_report(report_id, {"image": 1})
         if not report_data:
             raise HTTPException(status_code=404, detail="Report not found")
 
-        # Convert to model
-        report = WasteReport.from_mongo(report_data)
-
         # Get the original image
-        before_image = report.image  # Access image directly from WasteReport model
+        before_image = report_data.get("image")
         if not before_image:
             raise HTTPException(
                 status_code=400,
@@ -269,15 +325,13 @@ async def verify_cleanup(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error verifying cleanup: {str(e)}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.exception("Error verifying cleanup: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error verifying cleanup: {str(e)}"
         )
 
-async def update_waste_report_status(report_id: str, status: str, verification_details: dict) -> bool:
+async def update_waste_report_status(report_id: ObjectId, status: str, verification_details: dict) -> bool:
     """
     Update the status of a waste report in the database.
     """
@@ -287,12 +341,12 @@ async def update_waste_report_status(report_id: str, status: str, verification_d
         
         # Update the report status and verification details
         result = await db["waste_reports"].update_one(
-            {"_id": ObjectId(report_id)},
+            {"_id": report_id},
             {
                 "$set": {
                     "status": status,
                     "verification_details": verification_details,
-                    "updated_at": datetime.utcnow()
+                    "updated_at": utc_now()
                 }
             }
         )
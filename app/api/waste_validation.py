@@ -1,18 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Body, Query
 from typing import Optional
 from datetime import datetime
+from ..database import utc_now
 from ..auth.router import get_optional_authority
-from ..models import WasteReportValidationRequest, WasteReportValidationResponse, WasteType, Dustbin, RecyclableItem, TimeAnalysis, DescriptionMatch, SeverityLevel, WasteReport
-from ..services.gemini_service import validate_waste_image
+from ..models import WasteReportValidationRequest, WasteReportValidationResponse, WasteType, Dustbin, RecyclableItem, TimeAnalysis, DescriptionMatch, SeverityLevel, WasteReport, split_csv, parse_confidences
+from ..services.gemini_service import validate_waste_image, strip_data_url_prefix
 from ..crud import waste_report as waste_report_crud
 from ..crud import user as user_crud
 from ..crud import badge as badge_crud
 from ..crud import digital_wallet as wallet_crud
 from ..crud import city as city_crud
-import base64
-from app.services.notification_service import notification_service
+import asyncio
+import pybase64 as base64
 import logging
 
+logger = logging.getLogger(__name__)
+
 # Use the same tag as the main API router to avoid duplication in Swagger docs
 router = APIRouter()
 
@@ -38,6 +41,32 @@ async def get_optional_authority(
     # For testing purposes - bypass authentication
     return None
 
+async def update_city_stats_for_report(user_id: str, severity: str) -> None:
+    """
+    Update city stats for a newly saved report if the user has city information
+    
+    The engagement update recomputes the city's scores from its report counts,
+    so it must run after the report count increment.
+    """
+    user = await user_crud.get_user_by_id(user_id)
+    if not user or not user.get("city"):
+        return
+    city_name = user.get("city")
+    
+    # Increment report count for city
+    await city_crud.increment_city_report_count(city_name)
+    
+    # Update city engagement score based on severity
+    engagement_delta = 0
+    if severity == SeverityLevel.CRITICAL:
+        engagement_delta = 2.0
+    elif severity == SeverityLevel.HIGH:
+        engagement_delta = 1.0
+    elif severity == SeverityLevel.MEDIUM:
+        engagement_delta = 0.5
+        
+    await city_crud.update_city_engagement(city_name, engagement_delta)
+
 async def save_report_if_severe(validation_result: dict, user_data: dict = None) -> Optional[dict]:
     """
     Save a waste report to the database if severity level warrants storage
@@ -64,7 +93,7 @@ async def save_report_if_severe(validation_result: dict, user_data: dict = None)
         # User provided data
         "location": validation_result.get("location", ""),
         "description": validation_result.get("description", ""),
-        "timestamp": datetime.fromisoformat(validation_result.get("timestamp", datetime.utcnow().isoformat())),
+        "timestamp": datetime.fromisoformat(validation_result.get("timestamp", utc_now().isoformat())),
         
         # Store the image as a base64 encoded string
         "image": validation_result.get("image"),
@@ -73,8 +102,8 @@ async def save_report_if_severe(validation_result: dict, user_data: dict = None)
         "severity": severity,
         
         # Waste Types
-        "waste_types": validation_result.get("waste_types", {}).get("types", ""),
-        "waste_type_confidences": validation_result.get("waste_types", {}).get("confidence", ""),
+        "waste_types": split_csv(validation_result.get("waste_types", {}).get("types", "")),
+        "waste_type_confidences": parse_confidences(validation_result.get("waste_types", {}).get("confidence", "")),
         
         # Dustbins
         "dustbin_present": validation_result.get("dustbins", {}).get("is_present", False),
@@ -112,46 +141,31 @@ async def save_report_if_severe(validation_result: dict, user_data: dict = None)
     saved_report = await waste_report_crud.create_waste_report(report_data)
     print(f"Saved waste report with ID: {saved_report.get('id')} and severity: {severity}")
     
-    # Update user badge stats if user_id is available
+    # Update user badge stats, wallet and city stats if user_id is available.
+    # These touch independent collections, so they run concurrently
     if user_data and user_data.get("user_id"):
         user_id = user_data.get("user_id")
-        await badge_crud.increment_user_report_count(user_id)
         
-        # Calculate and credit eco-friendly coins based on severity
+        # Calculate eco-friendly coins based on severity
         base_coins = COINS_PER_REPORT
         multiplier = SEVERITY_MULTIPLIERS.get(severity.lower(), 1.0)
         coins_earned = int(base_coins * multiplier)
         
-        # Credit coins to user's digital wallet
-        await wallet_crud.add_coins(
-            user_id=user_id,
-            amount=coins_earned,
-            description=f"Earned {coins_earned} eco-friendly coins for submitting a {severity} severity waste report"
+        await asyncio.gather(
+            badge_crud.increment_user_report_count(user_id),
+            # Credit coins to user's digital wallet
+            wallet_crud.add_coins(
+                user_id=user_id,
+                amount=coins_earned,
+                description=f"Earned {coins_earned} eco-friendly coins for submitting a {severity} severity waste report"
+            ),
+            update_city_stats_for_report(user_id, severity)
         )
         
         # Add coin information to the report's additional data
         if not saved_report.get("additional_data"):
             saved_report["additional_data"] = {}
         saved_report["additional_data"]["coins_earned"] = coins_earned
-        
-        # Update city stats if user has city information
-        user = await user_crud.get_user_by_id(user_id)
-        if user and user.get("city"):
-            city_name = user.get("city")
-            
-            # Increment report count for city
-            await city_crud.increment_city_report_count(city_name)
-            
-            # Update city engagement score based on severity
-            engagement_delta = 0
-            if severity == SeverityLevel.CRITICAL:
-                engagement_delta = 2.0
-            elif severity == SeverityLevel.HIGH:
-                engagement_delta = 1.0
-            elif severity == SeverityLevel.MEDIUM:
-                engagement_delta = 0.5
-                
-            await city_crud.update_city_engagement(city_name, engagement_delta)
     
     return saved_report
 
@@ -235,7 +249,8 @@ async def validate_waste_report(
             image=base64_image,
             description=description,
             location=location,
-            timestamp=timestamp
+            timestamp=timestamp,
+            image_bytes=image_content
         )
         
         # Add input data to validation result for storage
@@ -280,8 +295,8 @@ async def validate_waste_report(
             description_match_confidence=validation_result.get("description_match", {}).get("confidence"),
             description_match_notes=validation_result.get("description_match", {}).get("notes"),
             
-            # Additional Data
-            additional_data=validation_result.get("additional_data", {})
+            # Additional Data (always a dict so saved-report details can be added to it)
+            additional_data=validation_result.get("additional_data") or {}
         )
         
         # Save to database if severity is Medium, High, or Critical
@@ -315,8 +330,6 @@ async def validate_waste_report(
             
             # Add report ID to the response if saved
             if saved_report:
-                if not response.additional_data:
-                    response.additional_data = {}
                 response.additional_data["report_id"] = saved_report.get("id")
                 response.additional_data["saved_to_database"] = True
                 
@@ -348,16 +361,14 @@ async def validate_waste_report(
         # Re-raise HTTP exceptions as-is
         raise
     except Exception as e:
-        import traceback
-        error_traceback = traceback.format_exc()
-        print(f"Error validating waste report: {str(e)}")
-        print(f"Traceback: {error_traceback}")
+        # The traceback is formatted by the logging handler, and only if the record
+        # is emitted; it stays out of the response
+        logger.exception("Error validating waste report: %s", e)
         
         raise HTTPException(
             status_code=500,
             detail={
-                "message": f"Error validating waste report: {str(e)}",
-                "traceback": error_traceback
+                "message": f"Error validating waste report: {str(e)}"
             }
         )
 
@@ -412,12 +423,8 @@ async def validate_waste_report_base64(
             
         # Basic validation of base64 string
         try:
-            # Check if it's a data URL
-            if "base64," in request.image:
-                # Extract the image data after the prefix
-                base64_content = request.image.split("base64,")[1]
-            else:
-                base64_content = request.image
+            # Extract the image data after the data URL prefix, if any
+            base64_content = strip_data_url_prefix(request.image)
                 
             # Try to decode to check if it's valid base64
             try:
@@ -430,7 +437,7 @@ async def validate_waste_report_base64(
                     detail=f"Invalid base64 image data: {str(e)}"
                 )
         except Exception as e:
-            if "base64," not in request.image:
+            if base64_content is request.image:
                 raise HTTPException(
                     status_code=400, 
                     detail="Invalid base64 image format. Base64 string couldn't be processed."
@@ -446,7 +453,8 @@ async def validate_waste_report_base64(
             image=request.image,
             description=request.description,
             location=request.location,
-            timestamp=request.timestamp
+            timestamp=request.timestamp,
+            image_bytes=decoded
         )
         
         # Add input data to validation result for storage
@@ -490,8 +498,8 @@ async def validate_waste_report_base64(
             description_match_confidence=validation_result.get("description_match", {}).get("confidence"),
             description_match_notes=validation_result.get("description_match", {}).get("notes"),
             
-            # Additional Data
-            additional_data=validation_result.get("additional_data", {})
+            # Additional Data (always a dict so saved-report details can be added to it)
+            additional_data=validation_result.get("additional_data") or {}
         )
         
         # Save to database if severity is Medium, High, or Critical
@@ -525,8 +533,6 @@ async def validate_waste_report_base64(
             
             # Add report ID to the response if saved
             if saved_report:
-                if not response.additional_data:
-                    response.additional_data = {}
                 response.additional_data["report_id"] = saved_report.get("id")
                 response.additional_data["saved_to_database"] = True
                 
@@ -558,15 +564,13 @@ async def validate_waste_report_base64(
         # Re-raise HTTP exceptions as-is
         raise
     except Exception as e:
-        import traceback
-        error_traceback = traceback.format_exc()
-        print(f"Error validating waste report: {str(e)}")
-        print(f"Traceback: {error_traceback}")
+        # The traceback is formatted by the logging handler, and only if the record
+        # is emitted; it stays out of the response
+        logger.exception("Error validating waste report: %s", e)
         
         raise HTTPException(
             status_code=500,
             detail={
-                "message": f"Error validating waste report: {str(e)}",
-                "traceback": error_traceback
+                "message": f"Error validating waste report: {str(e)}"
             }
         ) 
\ No newline at end of file
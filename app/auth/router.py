@@ -16,6 +16,18 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/authority/login", auto_error=False)
 
+# Shared client so Google OAuth callbacks reuse pooled connections to the token and
+# userinfo endpoints instead of a new TLS handshake per login
+google_oauth_client = httpx.AsyncClient(
+    timeout=10.0,
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=10, max_connections=50)
+)
+
+async def close_google_oauth_client():
+    """Close the shared Google OAuth HTTP client; called on application shutdown"""
+    await google_oauth_client.aclose()
+
 
 async def get_current_authority(token: str = Depends(oauth2_scheme)):
     """
@@ -143,39 +155,38 @@ async def google_callback(code: str):
             "grant_type": "authorization_code"
         }
 
-        async with httpx.AsyncClient() as client:
-            token_response = await client.post(token_url, data=token_data)
-            token_response.raise_for_status()
-            tokens = token_response.json()
-
-            userinfo_response = await client.get(
-                "https://www.googleapis.com/oauth2/v3/userinfo",
-                headers={"Authorization": f"Bearer {tokens['access_token']}"}
-            )
-            userinfo_response.raise_for_status()
-            user_info = userinfo_response.json()
-
-            # Get or create user
-            user = await user_crud.get_or_create_google_user(user_info)
-            
-            # Prepare user data for the redirect
-            user_data = {
-                "email": user["email"],
-                "name": user["name"],
-                "picture": user.get("picture", "")
-            }
-            
-            # Encode user data
-            import base64
-            import json
-            encoded_data = base64.b64encode(json.dumps(user_data).encode()).decode()
-            
-            # Redirect to frontend with data
-            frontend_url = "http://localhost:3000"
-            return RedirectResponse(
-                f"{frontend_url}/?success=true&user={encoded_data}",
-                status_code=302
-            )
+        token_response = await google_oauth_client.post(token_url, data=token_data)
+        token_response.raise_for_status()
+        tokens = token_response.json()
+
+        userinfo_response = await google_oauth_client.get(
+            "https://www.googleapis.com/oauth2/v3/userinfo",
+            headers={"Authorization": f"Bearer {tokens['access_token']}"}
+        )
+        userinfo_response.raise_for_status()
+        user_info = userinfo_response.json()
+
+        # Get or create user
+        user = await user_crud.get_or_create_google_user(user_info)
+        
+        # Prepare user data for the redirect
+        user_data = {
+            "email": user["email"],
+            "name": user["name"],
+            "picture": user.get("picture", "")
+        }
+        
+        # Encode user data
+        import base64
+        import json
+        encoded_data = base64.b64encode(json.dumps(user_data).encode()).decode()
+        
+        # Redirect to frontend with data
+        frontend_url = "http://localhost:3000"
+        return RedirectResponse(
+            f"{frontend_url}/?success=true&user={encoded_data}",
+            status_code=302
+        )
 
     except Exception as e:
         # Redirect to frontend with error
@@ -1,4 +1,4 @@
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
 
 class Settings(BaseSettings):
@@ -18,6 +18,10 @@ class Settings(BaseSettings):
     
     # Gemini API settings
     GOOGLE_API_KEY: str
+    # Re-encode resized uploads as WebP instead of JPEG (smaller, but check answer quality)
+    GEMINI_UPLOAD_WEBP: bool = False
+    # Gzip generateContent request bodies (the base64 images shrink by about a fifth)
+    GEMINI_GZIP_REQUESTS: bool = False
     
     # Testing settings
     BYPASS_AUTH: bool = False
@@ -28,8 +32,11 @@ class Settings(BaseSettings):
     TWILIO_PHONE_NUMBER: str = ""
     ADMIN_PHONE_NUMBER: str = ""
     
-    class Config:
-        env_file = ".env"
+    # Profiling settings (enables ?profile=1 on every endpoint; keep off in production)
+    PROFILING: bool = False
+    
+    # Parsed once per process (see get_settings); frozen so the shared instance can't drift
+    model_config = SettingsConfigDict(env_file=".env", frozen=True, extra="ignore")
 
 @lru_cache()
 def get_settings():
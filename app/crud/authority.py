@@ -1,16 +1,16 @@
-from datetime import datetime
 from typing import Optional, Dict, Any
-from bson import ObjectId
-from app.database import authorities_collection
+from pymongo import ReturnDocument
+from ..database import authorities_collection, to_object_id, utc_now
 from app.models import AuthorityCreate, Authority
-from app.security import get_password_hash, verify_password
+from app.security import get_password_hash_async, verify_password_async
 
 async def create_authority(authority: AuthorityCreate) -> Authority:
     """Create a new authority"""
     authority_dict = authority.dict()
-    authority_dict["password"] = get_password_hash(authority_dict["password"])
-    authority_dict["created_at"] = datetime.utcnow()
-    authority_dict["updated_at"] = datetime.utcnow()
+    authority_dict["password"] = await get_password_hash_async(authority_dict["password"])
+    now = utc_now()
+    authority_dict["created_at"] = now
+    authority_dict["updated_at"] = now
     
     result = await authorities_collection.insert_one(authority_dict)
     authority_dict["id"] = str(result.inserted_id)
@@ -23,32 +23,36 @@ async def get_authority_by_username(username: str) -> Optional[Dict[str, Any]]:
 
 async def get_authority_by_id(authority_id: str) -> Optional[Dict[str, Any]]:
     """Get authority by ID"""
-    return await authorities_collection.find_one({"_id": ObjectId(authority_id)})
+    return await authorities_collection.find_one({"_id": to_object_id(authority_id)})
 
 async def update_authority(authority_id: str, authority_data: dict) -> Optional[Dict[str, Any]]:
     """Update authority data"""
-    authority_data["updated_at"] = datetime.utcnow()
+    authority_data["updated_at"] = utc_now()
     
     if "password" in authority_data:
-        authority_data["password"] = get_password_hash(authority_data["password"])
+        authority_data["password"] = await get_password_hash_async(authority_data["password"])
     
-    result = await authorities_collection.update_one(
-        {"_id": ObjectId(authority_id)},
-        {"$set": authority_data}
+    return await authorities_collection.find_one_and_update(
+        {"_id": to_object_id(authority_id)},
+        {"$set": authority_data},
+        return_document=ReturnDocument.AFTER
     )
-    
-    if result.modified_count:
-        return await get_authority_by_id(authority_id)
-    return None
 
 async def delete_authority(authority_id: str) -> bool:
     """Delete authority"""
-    result = await authorities_collection.delete_one({"_id": ObjectId(authority_id)})
+    result = await authorities_collection.delete_one({"_id": to_object_id(authority_id)})
     return result.deleted_count > 0
 
+# Fields needed to verify a login and issue its token
+CREDENTIALS_PROJECTION = {"_id": 1, "username": 1, "password": 1, "role": 1}
+
+async def _get_authority_credentials(username: str) -> Optional[Dict[str, Any]]:
+    """Get only the fields of an authority needed for authentication"""
+    return await authorities_collection.find_one({"username": username}, CREDENTIALS_PROJECTION)
+
 async def authenticate_authority(username: str, password: str) -> Optional[Dict[str, Any]]:
     """Authenticate authority"""
-    authority = await get_authority_by_username(username)
-    if not authority or not verify_password(password, authority["password"]):
+    authority = await _get_authority_credentials(username)
+    if not authority or not await verify_password_async(password, authority["password"]):
         return None
     return authority 
\ No newline at end of file
@@ -1,7 +1,9 @@
-from datetime import datetime
+import asyncio
+import time
 from typing import Dict, Any, List, Optional
 from bson import ObjectId
-from app.database import database
+from pymongo import ReturnDocument
+from ..database import database, to_object_id, utc_now
 from app.models import Badge, BadgeLevel, UserBadge, UserBadgeStats
 
 # Collections
@@ -9,6 +11,11 @@ badges_collection = database["badges"]
 user_badges_collection = database["user_badges"]
 user_badge_stats_collection = database["user_badge_stats"]
 
+# In-process cache of the badge catalog (badges change very rarely)
+BADGE_CACHE_TTL = 60  # seconds
+_badge_cache = {"ts": 0, "data": None}
+_badge_cache_lock = asyncio.Lock()
+
 def serialize_mongo_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
     """
     Serialize MongoDB document by converting ObjectIds to strings
@@ -16,12 +23,15 @@ def serialize_mongo_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
     """
     if not doc:
         return {}
-        
+    
+    object_id = ObjectId
     result = {}
     for key, value in doc.items():
-        if isinstance(value, ObjectId):
+        value_type = type(value)
+        if value_type is object_id:
             result[key] = str(value)
-        elif isinstance(value, list) and value and all(isinstance(item, ObjectId) for item in value):
+        # Lists stored by this app are homogeneous, so checking the first item is enough
+        elif value_type is list and value and type(value[0]) is object_id:
             result[key] = [str(item) for item in value]
         else:
             result[key] = value
@@ -32,20 +42,28 @@ def serialize_mongo_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
     
     return result
 
+# Aggregation stages producing the same shape as serialize_mongo_doc on the server
+STRINGIFY_ID_STAGES = [
+    {"$set": {"_id": {"$toString": "$_id"}}},
+    {"$set": {"id": "$_id"}}
+]
+
 # Badge CRUD operations
 async def create_badge(badge_data: Dict[str, Any]) -> Dict[str, Any]:
     """Create a new badge"""
-    badge_data["created_at"] = datetime.utcnow()
-    badge_data["updated_at"] = datetime.utcnow()
+    now = utc_now()
+    badge_data["created_at"] = now
+    badge_data["updated_at"] = now
     
     result = await badges_collection.insert_one(badge_data)
     badge_data["id"] = str(result.inserted_id)
+    invalidate_badge_cache()
     
     return badge_data
 
 async def get_badge(badge_id: str) -> Optional[Dict[str, Any]]:
     """Get badge by ID"""
-    badge = await badges_collection.find_one({"_id": ObjectId(badge_id)})
+    badge = await badges_collection.find_one({"_id": to_object_id(badge_id)})
     return serialize_mongo_doc(badge)
 
 async def get_badge_by_required_reports(required_reports: int) -> Optional[Dict[str, Any]]:
@@ -55,39 +73,59 @@ async def get_badge_by_required_reports(required_reports: int) -> Optional[Dict[
 
 async def get_badges() -> List[Dict[str, Any]]:
     """Get all badges sorted by required_reports"""
-    cursor = badges_collection.find().sort("required_reports", 1)
-    badges = []
-    async for badge in cursor:
-        badges.append(serialize_mongo_doc(badge))
-    return badges
+    pipeline = [{"$sort": {"required_reports": 1}}, *STRINGIFY_ID_STAGES]
+    return await badges_collection.aggregate(pipeline).to_list(length=None)
+
+async def get_badges_cached(ttl: float = BADGE_CACHE_TTL) -> List[Dict[str, Any]]:
+    """Get all badges from the in-process cache, refreshing it when stale"""
+    if _badge_cache["data"] is not None and time.monotonic() - _badge_cache["ts"] < ttl:
+        return _badge_cache["data"]
+    
+    async with _badge_cache_lock:
+        # Another coroutine may have refreshed the cache while we waited
+        if _badge_cache["data"] is not None and time.monotonic() - _badge_cache["ts"] < ttl:
+            return _badge_cache["data"]
+        _badge_cache["data"] = await get_badges()
+        _badge_cache["ts"] = time.monotonic()
+        return _badge_cache["data"]
+
+def invalidate_badge_cache() -> None:
+    """Force the next get_badges_cached call to reload from the database"""
+    _badge_cache["ts"] = 0
+    _badge_cache["data"] = None
 
 async def update_badge(badge_id: str, badge_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Update badge data"""
-    badge_data["updated_at"] = datetime.utcnow()
+    badge_data["updated_at"] = utc_now()
     
-    result = await badges_collection.update_one(
-        {"_id": ObjectId(badge_id)},
-        {"$set": badge_data}
+    badge = await badges_collection.find_one_and_update(
+        {"_id": to_object_id(badge_id)},
+        {"$set": badge_data},
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.modified_count:
-        return await get_badge(badge_id)
+    if badge:
+        invalidate_badge_cache()
+        return serialize_mongo_doc(badge)
     return None
 
 async def delete_badge(badge_id: str) -> bool:
     """Delete a badge"""
-    result = await badges_collection.delete_one({"_id": ObjectId(badge_id)})
+    result = await badges_collection.delete_one({"_id": to_object_id(badge_id)})
+    if result.deleted_count:
+        invalidate_badge_cache()
     return result.deleted_count > 0
 
 # User Badge CRUD operations
 async def assign_user_badge(user_id: str, badge_id: str, badge_name: str, badge_level: str) -> Dict[str, Any]:
     """Assign a badge to a user"""
+    now = utc_now()
     user_badge = {
         "user_id": user_id,
         "badge_id": badge_id,
         "badge_name": badge_name,
         "badge_level": badge_level,
-        "earned_at": datetime.utcnow(),
+        "earned_at": now,
         "claimed": False,
         "claimed_at": None
     }
@@ -99,7 +137,7 @@ async def assign_user_badge(user_id: str, badge_id: str, badge_name: str, badge_
     await user_badge_stats_collection.update_one(
         {"user_id": user_id},
         {"$addToSet": {"badges_earned": badge_id}, 
-         "$set": {"updated_at": datetime.utcnow()}},
+         "$set": {"updated_at": now}},
         upsert=True
     )
     
@@ -107,21 +145,22 @@ async def assign_user_badge(user_id: str, badge_id: str, badge_name: str, badge_
 
 async def get_user_badges(user_id: str) -> List[Dict[str, Any]]:
     """Get all badges earned by a user"""
-    cursor = user_badges_collection.find({"user_id": user_id}).sort("earned_at", -1)
-    badges = []
-    async for badge in cursor:
-        badges.append(serialize_mongo_doc(badge))
-    return badges
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$sort": {"earned_at": -1}},
+        *STRINGIFY_ID_STAGES
+    ]
+    return await user_badges_collection.aggregate(pipeline).to_list(length=None)
 
 async def claim_badge(user_badge_id: str) -> Optional[Dict[str, Any]]:
     """Mark a badge as claimed"""
-    result = await user_badges_collection.update_one(
-        {"_id": ObjectId(user_badge_id)},
-        {"$set": {"claimed": True, "claimed_at": datetime.utcnow()}}
+    badge = await user_badges_collection.find_one_and_update(
+        {"_id": to_object_id(user_badge_id)},
+        {"$set": {"claimed": True, "claimed_at": utc_now()}},
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.modified_count:
-        badge = await user_badges_collection.find_one({"_id": ObjectId(user_badge_id)})
+    if badge:
         return serialize_mongo_doc(badge)
     return None
 
@@ -141,50 +180,55 @@ async def increment_user_report_count(user_id: str) -> Optional[Dict[str, Any]]:
     Returns:
         Updated user badge stats document or None if not found
     """
-    # First, get or create user badge stats
-    stats = await user_badge_stats_collection.find_one({"user_id": user_id})
-    
-    if stats:
-        # Increment report count
-        result = await user_badge_stats_collection.update_one(
+    # Atomically increment (or create) the user's badge stats and fetch the badge
+    # catalog concurrently; the two are independent
+    updated_stats, all_badges = await asyncio.gather(
+        user_badge_stats_collection.find_one_and_update(
             {"user_id": user_id},
-            {"$inc": {"total_reports": 1},
-             "$set": {"updated_at": datetime.utcnow()}}
-        )
-    else:
-        # Create new badge stats document
-        result = await user_badge_stats_collection.insert_one({
-            "user_id": user_id,
-            "total_reports": 1,
-            "badges_earned": [],
-            "updated_at": datetime.utcnow()
-        })
-    
-    # Get updated stats
-    updated_stats = await user_badge_stats_collection.find_one({"user_id": user_id})
+            [{"$set": {
+                "total_reports": {"$add": [{"$ifNull": ["$total_reports", 0]}, 1]},
+                "badges_earned": {"$ifNull": ["$badges_earned", []]},
+                "updated_at": "$$NOW"
+            }}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        ),
+        get_badges_cached()
+    )
     if not updated_stats:
         return None
     
     # Check badge eligibility
     total_reports = updated_stats.get("total_reports", 0)
-    
-    # Get all badges and sort by required reports
-    all_badges = await get_badges()
     eligible_badges = [b for b in all_badges if total_reports >= b.get("required_reports", 0)]
     
-    # Get current user badges
-    user_badges = await get_user_badges(user_id)
-    earned_badge_ids = [b.get("badge_id") for b in user_badges]
+    # Badges already earned, taken from the stats document we just updated
+    earned_badge_ids = set(updated_stats.get("badges_earned") or [])
     
-    # Assign any new eligible badges
-    for badge in eligible_badges:
-        if badge.get("id") not in earned_badge_ids:
-            await assign_user_badge(
-                user_id=user_id,
-                badge_id=badge.get("id"),
-                badge_name=badge.get("name"),
-                badge_level=badge.get("level")
-            )
+    # Assign any new eligible badges in one batch
+    new_badges = [b for b in eligible_badges if b.get("id") not in earned_badge_ids]
+    if new_badges:
+        now = utc_now()
+        await user_badges_collection.insert_many(
+            [
+                {
+                    "user_id": user_id,
+                    "badge_id": badge.get("id"),
+                    "badge_name": badge.get("name"),
+                    "badge_level": badge.get("level"),
+                    "earned_at": now,
+                    "claimed": False,
+                    "claimed_at": None
+                }
+                for badge in new_badges
+            ],
+            ordered=False
+        )
+        await user_badge_stats_collection.update_one(
+            {"user_id": user_id},
+            {"$addToSet": {"badges_earned": {"$each": [b.get("id") for b in new_badges]}},
+             "$set": {"updated_at": now}}
+        )
     
     # Return updated stats
     return serialize_mongo_doc(updated_stats)
@@ -192,8 +236,8 @@ async def increment_user_report_count(user_id: str) -> Optional[Dict[str, Any]]:
 # Initialize default badges if none exist
 async def initialize_default_badges():
     """Initialize default badges if none exist"""
-    count = await badges_collection.count_documents({})
-    if count == 0:
+    # Only need to know whether any badge exists; fetch a single _id instead of counting
+    if await badges_collection.find_one({}, {"_id": 1}) is None:
         default_badges = [
             {
                 "name": "Waste Warrior Bronze",
@@ -255,5 +299,10 @@ async def initialize_default_badges():
             }
         ]
         
+        # Seed all default badges in a single round-trip
+        now = utc_now()
         for badge_data in default_badges:
-            await create_badge(badge_data) 
\ No newline at end of file
+            badge_data["created_at"] = now
+            badge_data["updated_at"] = now
+        await badges_collection.insert_many(default_badges, ordered=False)
+        invalidate_badge_cache() 
\ No newline at end of file
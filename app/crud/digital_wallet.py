@@ -1,27 +1,17 @@
 from typing import Dict, Any, List, Optional
-from datetime import datetime
 from bson import ObjectId
-from ..database import get_database
+from pymongo import ReturnDocument
+from ..database import database, utc_now
 from ..models import DigitalWallet, EcoCoinTransaction
 
-# Initialize database and collections
-db = None
-wallet_collection = None
-transaction_collection = None
-
-async def init_collections():
-    global db, wallet_collection, transaction_collection
-    db = await get_database()
-    wallet_collection = db.digital_wallets
-    transaction_collection = db.eco_coin_transactions
+# Collections
+wallet_collection = database.digital_wallets
+transaction_collection = database.eco_coin_transactions
 
 async def get_wallet_by_user_id(user_id: str) -> Optional[Dict[str, Any]]:
     """
     Get digital wallet by user ID
     """
-    global wallet_collection
-    if wallet_collection is None:
-        await init_collections()
     wallet = await wallet_collection.find_one({"user_id": user_id})
     if wallet:
         wallet["id"] = str(wallet["_id"])
@@ -32,16 +22,14 @@ async def create_wallet(user_id: str) -> Dict[str, Any]:
     """
     Create a new digital wallet for a user
     """
-    global wallet_collection
-    if wallet_collection is None:
-        await init_collections()
+    now = utc_now()
     wallet_data = {
         "user_id": user_id,
         "balance": 0,
         "total_earned": 0,
         "total_spent": 0,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
+        "created_at": now,
+        "updated_at": now
     }
     
     result = await wallet_collection.insert_one(wallet_data)
@@ -53,63 +41,65 @@ async def add_coins(user_id: str, amount: int, description: str) -> Dict[str, An
     """
     Add coins to a user's wallet
     """
-    global wallet_collection, transaction_collection
-    if wallet_collection is None or transaction_collection is None:
-        await init_collections()
-    # Get or create wallet
-    wallet = await get_wallet_by_user_id(user_id)
-    if not wallet:
-        wallet = await create_wallet(user_id)
+    now = utc_now()
     
-    # Update wallet balance
+    # Update wallet balance, creating the wallet if it doesn't exist yet
     update_data = {
         "$inc": {
             "balance": amount,
             "total_earned": amount
         },
         "$set": {
-            "updated_at": datetime.utcnow()
+            "updated_at": now
+        },
+        "$setOnInsert": {
+            "total_spent": 0,
+            "created_at": now
         }
     }
     
-    await wallet_collection.update_one(
-        {"user_id": user_id},
-        update_data
-    )
-    
     # Create transaction record
     transaction_data = {
         "user_id": user_id,
         "type": "earn",
         "amount": amount,
         "description": description,
-        "created_at": datetime.utcnow()
+        "created_at": now
     }
     
+    # Record the transaction first, then credit the wallet. They are separate writes
+    # (a multi-document transaction needs a replica set), so if the credit fails the
+    # ledger entry is removed again and the balance and the ledger never diverge
     result = await transaction_collection.insert_one(transaction_data)
-    transaction_data["id"] = str(result.inserted_id)
-    del transaction_data["_id"]
+    try:
+        updated_wallet = await wallet_collection.find_one_and_update(
+            {"user_id": user_id},
+            update_data,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except Exception:
+        await transaction_collection.delete_one({"_id": result.inserted_id})
+        raise
     
-    # Get updated wallet
-    updated_wallet = await get_wallet_by_user_id(user_id)
+    # Format the updated wallet
+    if updated_wallet:
+        updated_wallet["id"] = str(updated_wallet["_id"])
+        del updated_wallet["_id"]
     return updated_wallet
 
 async def get_wallet_transactions(user_id: str) -> List[Dict[str, Any]]:
     """
     Get all transactions for a user's wallet
     """
-    global transaction_collection
-    if transaction_collection is None:
-        await init_collections()
-    transactions = await transaction_collection.find(
-        {"user_id": user_id}
-    ).sort("created_at", -1).to_list(length=None)
-    
-    for transaction in transactions:
-        transaction["id"] = str(transaction["_id"])
-        del transaction["_id"]
-    
-    return transactions
+    # Convert _id to a string id on the server
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$sort": {"created_at": -1}},
+        {"$set": {"id": {"$toString": "$_id"}}},
+        {"$unset": "_id"}
+    ]
+    return await transaction_collection.aggregate(pipeline).to_list(length=None)
 
 async def redeem_benefit(
     user_id: str,
@@ -119,42 +109,48 @@ async def redeem_benefit(
 ) -> Dict[str, Any]:
     """
     Redeem a benefit using eco-friendly coins
-    """
-    global wallet_collection, transaction_collection
-    if wallet_collection is None or transaction_collection is None:
-        await init_collections()
-    # Get wallet
-    wallet = await get_wallet_by_user_id(user_id)
-    if not wallet:
-        raise ValueError(f"Wallet not found for user {user_id}")
     
-    # Check balance
-    if wallet["balance"] < coins_used:
-        raise ValueError(f"Insufficient coins. Required: {coins_used}, Available: {wallet['balance']}")
+    Returns:
+        The transaction record, plus remaining_balance: the wallet balance
+        right after this deduction
+        
+    Raises:
+        LookupError: The user has no wallet
+        ValueError: The balance doesn't cover coins_used
+    """
+    now = utc_now()
     
-    # Update wallet balance
+    # Deduct coins only if the balance covers them, in a single atomic write
     update_data = {
         "$inc": {
             "balance": -coins_used,
             "total_spent": coins_used
         },
         "$set": {
-            "updated_at": datetime.utcnow()
+            "updated_at": now
         }
     }
     
-    await wallet_collection.update_one(
-        {"user_id": user_id},
-        update_data
+    updated_wallet = await wallet_collection.find_one_and_update(
+        {"user_id": user_id, "balance": {"$gte": coins_used}},
+        update_data,
+        return_document=ReturnDocument.AFTER
     )
     
+    if not updated_wallet:
+        # Distinguish a missing wallet from an insufficient balance
+        wallet = await get_wallet_by_user_id(user_id)
+        if not wallet:
+            raise LookupError(f"Wallet not found for user {user_id}")
+        raise ValueError(f"Insufficient coins. Required: {coins_used}, Available: {wallet['balance']}")
+    
     # Create transaction record
     transaction_data = {
         "user_id": user_id,
         "type": "spend",
         "amount": coins_used,
         "description": f"Redeemed benefit: {benefit_details['name']}",
-        "created_at": datetime.utcnow(),
+        "created_at": now,
         "benefit_id": benefit_id,
         "benefit_details": benefit_details,
         "validity_days": benefit_details.get("validity_days")
@@ -163,5 +159,7 @@ async def redeem_benefit(
     result = await transaction_collection.insert_one(transaction_data)
     transaction_data["id"] = str(result.inserted_id)
     del transaction_data["_id"]
+    # Taken from the deduction itself, so concurrent redemptions each report their own balance
+    transaction_data["remaining_balance"] = updated_wallet["balance"]
     
     return transaction_data 
\ No newline at end of file
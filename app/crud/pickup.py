@@ -1,30 +1,24 @@
 from typing import Dict, Any, List, Optional
-from datetime import datetime
 from bson import ObjectId
-from ..database import get_database
+from pymongo import ReturnDocument
+from ..database import database, utc_now
 from ..models import PickupRequest
 
-# Initialize database and collections
-db = None
-pickup_collection = None
+# Collections
+pickup_collection = database.pickup_requests
 
-async def init_collections():
-    global db, pickup_collection
-    db = await get_database()
-    pickup_collection = db.pickup_requests
+# Fields returned by pickup listings (the PickupRequest model)
+PICKUP_PROJECTION = {field: 1 for field in PickupRequest.model_fields if field != "id"}
 
 async def schedule_pickup(pickup_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Schedule a new pickup request
     """
-    global pickup_collection
-    if pickup_collection is None:
-        await init_collections()
-        
     # Ensure created_at and updated_at are set
+    now = utc_now()
     if not pickup_data.get("created_at"):
-        pickup_data["created_at"] = datetime.utcnow()
-    pickup_data["updated_at"] = datetime.utcnow()
+        pickup_data["created_at"] = now
+    pickup_data["updated_at"] = now
     
     # Insert the pickup request
     result = await pickup_collection.insert_one(pickup_data)
@@ -36,50 +30,54 @@ async def schedule_pickup(pickup_data: Dict[str, Any]) -> Dict[str, Any]:
         
     return pickup_data
 
+async def schedule_pickups_bulk(pickups: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Schedule several pickup requests in a single round-trip
+    """
+    if not pickups:
+        return []
+        
+    # Ensure created_at and updated_at are set
+    now = utc_now()
+    for pickup_data in pickups:
+        if not pickup_data.get("created_at"):
+            pickup_data["created_at"] = now
+        pickup_data["updated_at"] = now
+    
+    # Insert all pickup requests; unordered so one failure doesn't stop the rest
+    result = await pickup_collection.insert_many(pickups, ordered=False)
+    
+    # Replace MongoDB _id fields with string IDs
+    for pickup_data, inserted_id in zip(pickups, result.inserted_ids):
+        pickup_data["id"] = str(inserted_id)
+        pickup_data.pop("_id", None)
+        
+    return pickups
+
 async def get_all_pickups() -> List[Dict[str, Any]]:
     """
     Get all pickup requests
     """
-    global pickup_collection
-    if pickup_collection is None:
-        await init_collections()
-        
     # Fetch all pickup requests, sorted by pickup date
-    pickups = await pickup_collection.find().sort("pickup_date", 1).to_list(length=None)
+    pickups = await pickup_collection.find({}, PICKUP_PROJECTION).sort("pickup_date", 1).to_list(length=None)
     
     # Format the results
-    for pickup in pickups:
-        pickup["id"] = str(pickup["_id"])
-        del pickup["_id"]
-        
-    return pickups
+    return [{"id": str(pickup.pop("_id")), **pickup} for pickup in pickups]
 
 async def get_user_pickups(user_id: str) -> List[Dict[str, Any]]:
     """
     Get pickup requests for a specific user
     """
-    global pickup_collection
-    if pickup_collection is None:
-        await init_collections()
-        
     # Fetch pickups for the user, sorted by pickup date
-    pickups = await pickup_collection.find({"user_id": user_id}).sort("pickup_date", 1).to_list(length=None)
+    pickups = await pickup_collection.find({"user_id": user_id}, PICKUP_PROJECTION).sort("pickup_date", 1).to_list(length=None)
     
     # Format the results
-    for pickup in pickups:
-        pickup["id"] = str(pickup["_id"])
-        del pickup["_id"]
-        
-    return pickups
+    return [{"id": str(pickup.pop("_id")), **pickup} for pickup in pickups]
 
 async def get_pickup_by_id(pickup_id: str) -> Optional[Dict[str, Any]]:
     """
     Get a pickup request by ID
     """
-    global pickup_collection
-    if pickup_collection is None:
-        await init_collections()
-        
     try:
         # Convert string ID to ObjectId
         object_id = ObjectId(pickup_id)
@@ -99,24 +97,24 @@ async def update_pickup_status(pickup_id: str, status: str) -> Optional[Dict[str
     """
     Update the status of a pickup request
     """
-    global pickup_collection
-    if pickup_collection is None:
-        await init_collections()
-        
     try:
         # Convert string ID to ObjectId
         object_id = ObjectId(pickup_id)
         
-        # Update the pickup status
-        await pickup_collection.update_one(
+        # Update the pickup status and return the updated pickup
+        pickup = await pickup_collection.find_one_and_update(
             {"_id": object_id},
             {"$set": {
                 "status": status,
-                "updated_at": datetime.utcnow()
-            }}
+                "updated_at": utc_now()
+            }},
+            return_document=ReturnDocument.AFTER
         )
         
-        # Return the updated pickup
-        return await get_pickup_by_id(pickup_id)
+        if pickup:
+            pickup["id"] = str(pickup["_id"])
+            del pickup["_id"]
+            
+        return pickup
     except Exception:
         return None 
\ No newline at end of file
@@ -1,9 +1,31 @@
-from datetime import datetime
+import copy
 from typing import Optional, Dict, Any
 from bson import ObjectId
-from app.database import users_collection
+from cachetools import TTLCache
+from pymongo import ReturnDocument
+from ..database import users_collection, to_object_id, utc_now
 from app.models import GoogleUser
 
+# Serialized users keyed by ("id", user_id) and ("email", email); entries for a
+# user are always stored and evicted together. Callers get deep copies, so
+# changes to a returned user (nested fields included) never reach the cache
+USER_CACHE_TTL = 60
+_user_cache = TTLCache(maxsize=10_000, ttl=USER_CACHE_TTL)
+
+def _cache_user(user: Dict[str, Any]) -> None:
+    """Cache a serialized user under both its ID and email"""
+    if user:
+        _user_cache[("id", user["id"])] = user
+        _user_cache[("email", user.get("email"))] = user
+
+def _evict_user(user_id: str, *emails: Optional[str]) -> None:
+    """Drop a user's cached entries, including those under any of the given emails"""
+    user = _user_cache.pop(("id", user_id), None)
+    if user:
+        _user_cache.pop(("email", user.get("email")), None)
+    for email in emails:
+        _user_cache.pop(("email", email), None)
+
 def serialize_mongo_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
     """
     Serialize MongoDB document by converting ObjectIds to strings
@@ -11,12 +33,15 @@ def serialize_mongo_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
     """
     if not doc:
         return {}
-        
+    
+    object_id = ObjectId
     result = {}
     for key, value in doc.items():
-        if isinstance(value, ObjectId):
+        value_type = type(value)
+        if value_type is object_id:
             result[key] = str(value)
-        elif isinstance(value, list) and value and all(isinstance(item, ObjectId) for item in value):
+        # Lists stored by this app are homogeneous, so checking the first item is enough
+        elif value_type is list and value and type(value[0]) is object_id:
             result[key] = [str(item) for item in value]
         else:
             result[key] = value
@@ -29,10 +54,11 @@ def serialize_mongo_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
 
 async def create_user(user_data: dict) -> Dict[str, Any]:
     """Create a new user"""
+    now = utc_now()
     user_dict = {
         **user_data,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
+        "created_at": now,
+        "updated_at": now
     }
     
     result = await users_collection.insert_one(user_dict)
@@ -42,32 +68,52 @@ async def create_user(user_data: dict) -> Dict[str, Any]:
 
 async def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
     """Get user by email"""
-    user = await users_collection.find_one({"email": email})
-    return serialize_mongo_doc(user)
+    cached = _user_cache.get(("email", email))
+    if cached:
+        return copy.deepcopy(cached)
+    user = serialize_mongo_doc(await users_collection.find_one({"email": email}))
+    _cache_user(user)
+    return copy.deepcopy(user)
 
 async def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
     """Get user by ID"""
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
-    return serialize_mongo_doc(user)
+    cached = _user_cache.get(("id", user_id))
+    if cached:
+        return copy.deepcopy(cached)
+    user = serialize_mongo_doc(await users_collection.find_one({"_id": to_object_id(user_id)}))
+    _cache_user(user)
+    return copy.deepcopy(user)
 
 async def update_user(user_id: str, user_data: dict) -> Optional[Dict[str, Any]]:
     """Update user data"""
-    user_data["updated_at"] = datetime.utcnow()
+    user_data["updated_at"] = utc_now()
     
-    result = await users_collection.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$set": user_data}
-    )
+    # The email before the update, whose cache entry must go too. The cached entry
+    # has it; when that has expired, a projected read is still cheaper than
+    # leaving a stale entry under the old email
+    cached = _user_cache.get(("id", user_id))
+    if cached:
+        previous_email = cached.get("email")
+    else:
+        previous = await users_collection.find_one({"_id": to_object_id(user_id)}, {"email": 1})
+        previous_email = previous.get("email") if previous else None
     
-    if result.modified_count:
-        user = await get_user_by_id(user_id)
-        return user
-    return None
+    updated = await users_collection.find_one_and_update(
+        {"_id": to_object_id(user_id)},
+        {"$set": user_data},
+        return_document=ReturnDocument.AFTER
+    )
+    _evict_user(user_id, previous_email, updated.get("email") if updated else user_data.get("email"))
+    return serialize_mongo_doc(updated)
 
 async def delete_user(user_id: str) -> bool:
     """Delete user"""
-    result = await users_collection.delete_one({"_id": ObjectId(user_id)})
-    return result.deleted_count > 0
+    deleted = await users_collection.find_one_and_delete(
+        {"_id": to_object_id(user_id)},
+        projection={"email": 1}
+    )
+    _evict_user(user_id, deleted.get("email") if deleted else None)
+    return deleted is not None
 
 async def get_or_create_google_user(user_info: dict) -> Dict[str, Any]:
     """Get existing user or create new one from Google info"""
@@ -1,14 +1,224 @@
+import asyncio
+import logging
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 from bson import ObjectId
-from app.database import database
-from app.services.notification_service import NotificationService
+from bson.errors import InvalidId
+from pymongo import ReadPreference, ReturnDocument
+from ..database import database, to_object_id, utc_now
+from ..models import WasteReportSummary
+from app.services.notification_service import get_notification_service
+
+logger = logging.getLogger(__name__)
 
 # Collection name
 waste_reports_collection = database["waste_reports"]
 
-# Initialize notification service
-notification_service = NotificationService()
+# Read-only handle for listings, which tolerate replica lag; reads go to a
+# secondary when one is available (same as primary on a standalone server)
+waste_reports_read_collection = database.get_collection(
+    "waste_reports", read_preference=ReadPreference.SECONDARY_PREFERRED
+)
+
+# References to in-flight notification tasks so they aren't garbage collected
+_notification_tasks = set()
+
+# Numeric severity rank stored on each report so MongoDB can sort by severity
+SEVERITY_RANK = {
+    "Critical": 5,
+    "High": 4,
+    "Medium": 3,
+    "Low": 2,
+    "Clean": 1
+}
+
+# Projection leaving out the base64 image, which is served separately
+REPORT_WITHOUT_IMAGE = {"image": 0}
+# WasteReportSummary fields, plus severity_rank for the pagination cursor
+REPORT_SUMMARY_PROJECTION = {
+    **{field: 1 for field in WasteReportSummary.model_fields if field != "id"},
+    "severity_rank": 1
+}
+
+# Report listing order, backed by the compound index in create_indexes;
+# _id breaks ties so every report has a unique position for keyset pagination
+REPORT_SORT = {"timestamp": -1, "severity_rank": -1, "confidence_score": -1, "_id": -1}
+
+# Cursor value standing for a null or missing confidence_score, which MongoDB
+# sorts below every number
+NULL_CONFIDENCE = ""
+
+def encode_report_cursor(report: Dict[str, Any]) -> Optional[str]:
+    """
+    Build the pagination cursor pointing just past a report in the listing order
+    
+    Args:
+        report: The report as read from MongoDB (before model conversion), with
+            its _id already moved to "id"
+    
+    Returns:
+        An opaque cursor string, or None if the report lacks the sort fields
+        (reports whose timestamp is still a string; see backfill_report_timestamps)
+    """
+    timestamp = report.get("timestamp")
+    if not isinstance(timestamp, datetime) or "severity_rank" not in report or "id" not in report:
+        return None
+    confidence_score = report.get("confidence_score")
+    if confidence_score is None:
+        confidence = NULL_CONFIDENCE
+    elif isinstance(confidence_score, (int, float)):
+        confidence = repr(float(confidence_score))
+    else:
+        return None
+    return f"{timestamp.isoformat()}|{report['severity_rank']}|{confidence}|{report['id']}"
+
+def _cursor_query(cursor: str) -> Dict[str, Any]:
+    """
+    Translate a pagination cursor into a filter matching reports after it in the listing order
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        timestamp, severity_rank, confidence_score, report_id = cursor.split("|")
+        timestamp = datetime.fromisoformat(timestamp)
+        severity_rank = int(severity_rank)
+        confidence_score = None if confidence_score == NULL_CONFIDENCE else float(confidence_score)
+        report_id = ObjectId(report_id)
+    except (ValueError, InvalidId):
+        raise ValueError(f"Invalid pagination cursor: {cursor}")
+    
+    # Every sort key is descending, so "after" means smaller on the first key that
+    # differs. Range operators never match null, so reports with a null or missing
+    # confidence_score (sorted after every number) are matched explicitly
+    same_rank = {"timestamp": timestamp, "severity_rank": severity_rank}
+    if confidence_score is None:
+        confidence_clauses = [
+            {**same_rank, "confidence_score": None, "_id": {"$lt": report_id}}
+        ]
+    else:
+        confidence_clauses = [
+            {**same_rank, "confidence_score": {"$lt": confidence_score}},
+            {**same_rank, "confidence_score": None},
+            {**same_rank, "confidence_score": confidence_score, "_id": {"$lt": report_id}}
+        ]
+    return {"$or": [
+        {"timestamp": {"$lt": timestamp}},
+        {"timestamp": timestamp, "severity_rank": {"$lt": severity_rank}},
+        *confidence_clauses
+    ]}
+
+async def backfill_severity_rank() -> int:
+    """
+    Store severity_rank on reports created before it existed so they sort and paginate correctly.
+    One-off migration, run through app.migrations rather than on every start
+    
+    Returns:
+        Number of reports updated
+    """
+    # Severities outside SEVERITY_RANK get rank 0 and sort last; report how many
+    unknown = await waste_reports_collection.count_documents(
+        {"severity_rank": {"$exists": False}, "severity": {"$nin": list(SEVERITY_RANK)}}
+    )
+    if unknown:
+        logger.warning("%d reports have an unknown severity and were given severity_rank 0", unknown)
+    
+    result = await waste_reports_collection.update_many(
+        {"severity_rank": {"$exists": False}},
+        [{"$set": {"severity_rank": {"$switch": {
+            "branches": [
+                {"case": {"$eq": ["$severity", severity]}, "then": rank}
+                for severity, rank in SEVERITY_RANK.items()
+            ],
+            "default": 0
+        }}}}]
+    )
+    return result.modified_count
+
+async def backfill_report_timestamps() -> int:
+    """
+    Convert report timestamps stored as ISO strings to dates. MongoDB sorts strings
+    and dates in different type brackets, so string timestamps fall outside the
+    date-ordered listing and can't be reached by cursor pagination.
+    One-off migration, run through app.migrations
+    
+    Returns:
+        Number of reports updated
+    """
+    result = await waste_reports_collection.update_many(
+        {"timestamp": {"$type": "string"}},
+        [{"$set": {"timestamp": {"$convert": {
+            "input": "$timestamp", "to": "date", "onError": "$timestamp"
+        }}}}]
+    )
+    unparsable = await waste_reports_collection.count_documents({"timestamp": {"$type": "string"}})
+    if unparsable:
+        logger.warning("%d reports have a timestamp string that isn't a date and were left as is", unparsable)
+    return result.modified_count
+
+def _split_csv_expr(field: str) -> Dict[str, Any]:
+    """Aggregation expression splitting a comma-separated string field into trimmed, non-empty items"""
+    return {"$filter": {
+        "input": {"$map": {
+            "input": {"$split": [f"${field}", ","]},
+            "as": "item",
+            "in": {"$trim": {"input": "$$item"}}
+        }},
+        "as": "item",
+        "cond": {"$ne": ["$$item", ""]}
+    }}
+
+async def backfill_report_lists() -> int:
+    """
+    Convert waste_types and waste_type_confidences stored as comma-separated strings
+    (or a bare confidence number) to arrays, matching what the API now returns.
+    Confidence tokens that aren't numbers once a trailing "%" is removed are dropped,
+    the same as parse_confidences does for new reports.
+    One-off migration, run through app.migrations
+
+    Returns:
+        Number of reports updated
+    """
+    # $type in a query also matches arrays containing that type, so check the field itself
+    types_result = await waste_reports_collection.update_many(
+        {"$expr": {"$eq": [{"$type": "$waste_types"}, "string"]}},
+        [{"$set": {"waste_types": _split_csv_expr("waste_types")}}]
+    )
+
+    confidences_result = await waste_reports_collection.update_many(
+        {"$expr": {"$eq": [{"$type": "$waste_type_confidences"}, "string"]}},
+        [{"$set": {"waste_type_confidences": {"$filter": {
+            "input": {"$map": {
+                "input": _split_csv_expr("waste_type_confidences"),
+                "as": "item",
+                "in": {"$convert": {
+                    "input": {"$trim": {"input": "$$item", "chars": "% "}},
+                    "to": "double", "onError": None, "onNull": None
+                }}
+            }},
+            "as": "value",
+            "cond": {"$ne": ["$$value", None]}
+        }}}}]
+    )
+    number_result = await waste_reports_collection.update_many(
+        {"$expr": {"$isNumber": "$waste_type_confidences"}},
+        [{"$set": {"waste_type_confidences": [{"$toDouble": "$waste_type_confidences"}]}}]
+    )
+    return types_result.modified_count + confidences_result.modified_count + number_result.modified_count
+
+async def _safe_notify(report_data: Dict[str, Any]) -> None:
+    """Send the SMS alert for a report, logging failures instead of raising"""
+    try:
+        await get_notification_service().send_waste_report_alert(report_data)
+    except Exception:
+        # Log the error but don't fail the report creation
+        logger.exception("Failed to send SMS notification for report at %s", report_data.get("location"))
+
+def _notify_in_background(report_data: Dict[str, Any]) -> None:
+    """Send the SMS alert for a report without holding up the request"""
+    task = asyncio.create_task(_safe_notify(report_data))
+    _notification_tasks.add(task)
+    task.add_done_callback(_notification_tasks.discard)
 
 async def create_waste_report(report_data: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -22,38 +232,42 @@ async def create_waste_report(report_data: Dict[str, Any]) -> Dict[str, Any]:
         The created waste report document
     """
     # Add timestamps
-    report_data["created_at"] = datetime.utcnow()
-    report_data["updated_at"] = datetime.utcnow()
+    now = utc_now()
+    report_data["created_at"] = now
+    report_data["updated_at"] = now
     
     # Add report status
     report_data["status"] = "pending"  # pending, in_progress, resolved
     
+    # Store severity as a rank for index-backed sorting
+    report_data["severity_rank"] = SEVERITY_RANK.get(report_data.get("severity"), 0)
+    
     # Insert the document
     result = await waste_reports_collection.insert_one(report_data)
     
     # Add the ID to the data
     report_data["id"] = str(result.inserted_id)
     
-    # Send SMS notification
-    try:
-        await notification_service.send_waste_report_alert(report_data)
-    except Exception as e:
-        # Log the error but don't fail the report creation
-        print(f"Failed to send SMS notification: {str(e)}")
+    # Send SMS notification in the background
+    _notify_in_background(report_data)
     
     return report_data
 
-async def get_waste_report(report_id: str) -> Optional[Dict[str, Any]]:
+async def get_waste_report(
+    report_id: Union[str, ObjectId],
+    projection: Optional[Dict[str, int]] = None
+) -> Optional[Dict[str, Any]]:
     """
     Get a waste report by ID
     
     Args:
         report_id: The ID of the waste report
+        projection: Optional MongoDB projection limiting the returned fields
         
     Returns:
         The waste report document or None if not found
     """
-    report = await waste_reports_collection.find_one({"_id": ObjectId(report_id)})
+    report = await waste_reports_collection.find_one({"_id": to_object_id(report_id)}, projection)
     if report:
         report["id"] = str(report["_id"])
     return report
@@ -63,7 +277,9 @@ async def get_waste_reports(
     limit: int = 100,
     severity: Optional[str] = None,
     status: Optional[str] = None,
-    location_query: Optional[str] = None
+    location_query: Optional[str] = None,
+    projection: Optional[Dict[str, int]] = None,
+    after: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
     Get a list of waste reports with filtering options
@@ -73,13 +289,19 @@ async def get_waste_reports(
         limit: Maximum number of documents to return
         severity: Filter by severity level
         status: Filter by status
-        location_query: Text search in location field
+        location_query: Text search in location field (matches whole words)
+        projection: Optional MongoDB projection limiting the returned fields
+        after: Pagination cursor from encode_report_cursor; returns the reports
+            following it without scanning the skipped ones
         
     Returns:
         List of waste report documents sorted by:
         1. Timestamp (descending)
         2. Severity (Critical > High > Medium > Low > Clean)
         3. Confidence score (descending)
+    
+    Raises:
+        ValueError: If the pagination cursor is malformed
     """
     # Build query
     query = {}
@@ -91,41 +313,28 @@ async def get_waste_reports(
         query["status"] = status
         
     if location_query:
-        query["location"] = {"$regex": location_query, "$options": "i"}
-    
-    # Define severity order for sorting
-    severity_order = {
-        "Critical": 5,
-        "High": 4,
-        "Medium": 3,
-        "Low": 2,
-        "Clean": 1
-    }
-    
-    # Execute query with compound sort
-    cursor = waste_reports_collection.find(query).skip(skip).limit(limit)
-    
-    # Convert to list and add string IDs
-    reports = []
-    async for report in cursor:
-        report["id"] = str(report["_id"])
-        # Convert timestamp to datetime if it's a string
-        if isinstance(report.get("timestamp"), str):
-            report["timestamp"] = datetime.fromisoformat(report["timestamp"])
-        reports.append(report)
-    
-    # Sort the reports according to the specified criteria
-    reports.sort(
-        key=lambda x: (
-            -x["timestamp"].timestamp() if isinstance(x["timestamp"], datetime) else 0,  # Negative for descending order
-            -severity_order.get(x["severity"], 0),  # Negative for descending order
-            -x.get("confidence_score", 0)  # Negative for descending order
-        )
-    )
+        # Served by the location text index; an unanchored case-insensitive regex can't use an index
+        query["$text"] = {"$search": location_query}
         
-    return reports
+    if after:
+        query.update(_cursor_query(after))
+    
+    # Sort, skip and limit on the server so pagination follows the sort order
+    pipeline = [
+        {"$match": query},
+        {"$sort": REPORT_SORT},
+        {"$skip": skip},
+        {"$limit": limit}
+    ]
+    if projection:
+        pipeline.append({"$project": projection})
+    
+    # Convert to list and add string IDs; batchSize=limit returns the page in one batch.
+    # String timestamps are left for WasteReport.from_mongo to parse
+    cursor = waste_reports_read_collection.aggregate(pipeline, batchSize=limit)
+    return [{"id": str(report.pop("_id")), **report} async for report in cursor]
 
-async def update_waste_report_status(report_id: str, status: str) -> Optional[Dict[str, Any]]:
+async def update_waste_report_status(report_id: Union[str, ObjectId], status: str) -> Optional[Dict[str, Any]]:
     """
     Update the status of a waste report
     
@@ -136,21 +345,23 @@ async def update_waste_report_status(report_id: str, status: str) -> Optional[Di
     Returns:
         The updated waste report document or None if not found
     """
-    result = await waste_reports_collection.update_one(
-        {"_id": ObjectId(report_id)},
+    report = await waste_reports_collection.find_one_and_update(
+        {"_id": to_object_id(report_id)},
         {
             "$set": {
                 "status": status,
-                "updated_at": datetime.utcnow()
+                "updated_at": utc_now()
             }
-        }
+        },
+        projection=REPORT_WITHOUT_IMAGE,
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.modified_count:
-        return await get_waste_report(report_id)
-    return None
+    if report:
+        report["id"] = str(report["_id"])
+    return report
 
-async def add_waste_report_comment(report_id: str, comment: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+async def add_waste_report_comment(report_id: Union[str, ObjectId], comment: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """
     Add a comment to a waste report
     
@@ -161,22 +372,25 @@ async def add_waste_report_comment(report_id: str, comment: Dict[str, Any]) -> O
     Returns:
         The updated waste report document or None if not found
     """
-    # Add timestamp to comment
-    comment["timestamp"] = datetime.utcnow()
+    # Add timestamp to comment; the report's updated_at uses the same instant
+    now = utc_now()
+    comment["timestamp"] = now
     
-    result = await waste_reports_collection.update_one(
-        {"_id": ObjectId(report_id)},
+    report = await waste_reports_collection.find_one_and_update(
+        {"_id": to_object_id(report_id)},
         {
             "$push": {"comments": comment},
-            "$set": {"updated_at": datetime.utcnow()}
-        }
+            "$set": {"updated_at": now}
+        },
+        projection=REPORT_WITHOUT_IMAGE,
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.modified_count:
-        return await get_waste_report(report_id)
-    return None
+    if report:
+        report["id"] = str(report["_id"])
+    return report
 
-async def delete_waste_report(report_id: str) -> bool:
+async def delete_waste_report(report_id: Union[str, ObjectId]) -> bool:
     """
     Delete a waste report
     
@@ -186,10 +400,10 @@ async def delete_waste_report(report_id: str) -> bool:
     Returns:
         True if deleted, False otherwise
     """
-    result = await waste_reports_collection.delete_one({"_id": ObjectId(report_id)})
+    result = await waste_reports_collection.delete_one({"_id": to_object_id(report_id)})
     return result.deleted_count > 0
 
-async def update_waste_report(report_id: str, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+async def update_waste_report(report_id: Union[str, ObjectId], update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """
     Update a waste report with new data
     
@@ -201,20 +415,26 @@ async def update_waste_report(report_id: str, update_data: Dict[str, Any]) -> Op
         The updated waste report document or None if not found
     """
     # Add updated_at timestamp
-    update_data["updated_at"] = datetime.utcnow()
+    update_data["updated_at"] = utc_now()
+    
+    # Keep the sort rank in step with the severity
+    if "severity" in update_data:
+        update_data["severity_rank"] = SEVERITY_RANK.get(update_data["severity"], 0)
     
-    # Convert string ID to ObjectId
+    # Convert string ID to ObjectId once (ObjectIds pass through unchanged)
     try:
-        report_id = ObjectId(report_id)
-    except Exception:
+        object_id = to_object_id(report_id)
+    except InvalidId:
         raise ValueError(f"Invalid report ID format: {report_id}")
     
-    # Update the document
-    result = await waste_reports_collection.update_one(
-        {"_id": report_id},
-        {"$set": update_data}
+    # Update the document and return the updated version
+    report = await waste_reports_collection.find_one_and_update(
+        {"_id": object_id},
+        {"$set": update_data},
+        projection=REPORT_WITHOUT_IMAGE,
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.modified_count:
-        return await get_waste_report(str(report_id))
-    return None 
\ No newline at end of file
+    if report:
+        report["id"] = str(report["_id"])
+    return report 
\ No newline at end of file
@@ -1,9 +1,31 @@
+import logging
+import re
+from datetime import datetime, timezone
+from bson import ObjectId
+from bson.errors import InvalidId
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure
 from app.config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
-client = AsyncIOMotorClient(settings.MONGO_URI)
+# Single client (and connection pool) for the whole process. A small warm pool
+# spares the first requests after boot the connection handshake, idle
+# connections are recycled after a minute, and server selection fails fast
+# instead of hanging requests for the 30s default. Wire traffic is compressed
+# with zlib (stdlib; zstd/snappy would need extra packages). Datetimes are read
+# back as aware UTC values, matching the ones utc_now() writes
+client = AsyncIOMotorClient(
+    settings.MONGO_URI,
+    tz_aware=True,
+    maxPoolSize=50,
+    minPoolSize=10,
+    maxIdleTimeMS=60000,
+    serverSelectionTimeoutMS=3000,
+    retryWrites=True,
+    compressors="zlib"
+)
 database = client[settings.DATABASE_NAME]
 
 # Collections
@@ -16,19 +38,87 @@ async def get_database():
     """
     return database
 
+def utc_now() -> datetime:
+    """
+    Current time as an aware UTC datetime; every timestamp the app stores uses this,
+    so stored and freshly created datetimes can always be compared
+    """
+    return datetime.now(timezone.utc)
+
+# 24 hex characters, the string form of an ObjectId
+_OBJECT_ID_RE = re.compile(r"[0-9a-fA-F]{24}")
+
+def to_object_id(value) -> ObjectId:
+    """
+    Convert a string ID to an ObjectId, rejecting malformed IDs before any database call.
+    ObjectId instances are passed through unchanged so callers can parse an ID once and reuse it.
+
+    Raises:
+        InvalidId: If the value is not a valid ObjectId string
+    """
+    if type(value) is ObjectId:
+        return value
+    if not isinstance(value, str) or not _OBJECT_ID_RE.fullmatch(value):
+        raise InvalidId(f"{value!r} is not a valid ObjectId")
+    return ObjectId(value)
+
+async def _create_unique_index(collection, key, **kwargs):
+    """
+    Create a unique index on a collection written before the constraint existed.
+    Existing duplicates make the build fail; that is logged instead of aborting
+    startup, and the index is built on a later start once the data is cleaned up.
+    """
+    try:
+        await collection.create_index(key, unique=True, **kwargs)
+    except OperationFailure as e:
+        logger.error(
+            "Could not create unique index %s on %s (duplicate documents?): %s",
+            key, collection.name, e
+        )
+
 # Indexes
 async def create_indexes():
     # Authority indexes
     await authorities_collection.create_index("username", unique=True)
     await authorities_collection.create_index("email", unique=True)
-    
+
     # User indexes
     await users_collection.create_index("email", unique=True)
     await users_collection.create_index("google_id", unique=True)
     await users_collection.create_index("total_reports")  # For efficient badge level calculations
-    
+
     # Waste report indexes
     await database["waste_reports"].create_index([("created_at", -1)])  # Sort newest first
     await database["waste_reports"].create_index("severity")  # Filter by severity
-    await database["waste_reports"].create_index("status")  # Filter by status
-    await database["waste_reports"].create_index([("submitted_by.user_id", 1)])  # Find reports by user 
\ No newline at end of file
+    # Filter by status - partial indexes cover only open reports, so resolved
+    # reports (the bulk of the collection over time) don't bloat them
+    open_reports = {"status": {"$in": ["pending", "in_progress"]}}
+    await database["waste_reports"].create_index(
+        "status", name="status_open", partialFilterExpression=open_reports
+    )
+    await database["waste_reports"].create_index(
+        [("status", 1), ("created_at", -1)], name="status_open_created_at", partialFilterExpression=open_reports
+    )  # Open reports, newest first
+    try:
+        # Superseded full status index from earlier deployments
+        await database["waste_reports"].drop_index("status_1")
+    except OperationFailure:
+        pass
+    await database["waste_reports"].create_index([("submitted_by.user_id", 1)])  # Find reports by user
+    await database["waste_reports"].create_index([("location", "text")])  # Location search
+    await database["waste_reports"].create_index(
+        [("timestamp", -1), ("severity_rank", -1), ("confidence_score", -1), ("_id", -1)]
+    )  # Report listing order and keyset pagination
+
+    # Badge indexes
+    await database["badges"].create_index("required_reports")  # Catalog lookup and sort
+    await database["user_badges"].create_index([("user_id", 1), ("earned_at", -1)])  # User badges, newest first
+    await _create_unique_index(database["user_badge_stats"], "user_id")  # One stats document per user
+
+    # City stats indexes
+    await _create_unique_index(database["city_stats"], "city_name_lower")  # Case-insensitive city lookup
+    await database["city_stats"].create_index([("total_score", -1)])  # Leaderboard ordering
+
+    # Digital wallet indexes
+    await _create_unique_index(database["digital_wallets"], "user_id")  # One wallet per user
+    await database["eco_coin_transactions"].create_index([("user_id", 1), ("created_at", -1)])  # Transaction history
@@ -4,6 +4,9 @@ from .auth import router as auth_router
 from .api.routes import router as api_router
 from .api.waste_categorization import router as waste_categorization_router
 from .database import create_indexes
+from .migrations import run_migrations
+from .services.gemini_service import close_gemini_client, warm_gemini_client
+from .auth.router import close_google_oauth_client
 from .config import get_settings
 
 # Get settings
@@ -28,6 +31,22 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Opt-in profiling: with PROFILING enabled, adding ?profile=1 to a request returns
+# a pyinstrument flame graph of its handling instead of the normal response
+if settings.PROFILING:
+    from fastapi.responses import HTMLResponse
+    from pyinstrument import Profiler
+
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        if request.query_params.get("profile") != "1":
+            return await call_next(request)
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        await call_next(request)
+        profiler.stop()
+        return HTMLResponse(profiler.output_html())
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(api_router)
@@ -40,6 +59,16 @@ async def startup():
     """
     print("Setting up database indexes...")
     await create_indexes()
+    await run_migrations()
+    await warm_gemini_client()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """
+    Release shared resources when the application stops
+    """
+    await close_gemini_client()
+    await close_google_oauth_client()
 
 @app.get("/")
 def root():
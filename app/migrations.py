@@ -0,0 +1,36 @@
+"""
+One-off data migrations. Each runs once per database; completed migrations are
+recorded in the migrations collection so later starts skip them.
+"""
+import logging
+from .database import database, utc_now
+from .crud.waste_report import backfill_report_lists, backfill_report_timestamps, backfill_severity_rank
+
+logger = logging.getLogger(__name__)
+
+migrations_collection = database["migrations"]
+
+# Name and coroutine of every migration, in the order they must run. Each returns
+# the number of documents it changed and must be safe to run again, since two
+# workers starting together can both run a pending migration
+MIGRATIONS = (
+    ("waste_reports_severity_rank", backfill_severity_rank),
+    ("waste_reports_timestamp_dates", backfill_report_timestamps),
+    ("waste_reports_list_fields", backfill_report_lists),
+)
+
+async def run_migrations():
+    """
+    Run the migrations not yet recorded as applied
+    """
+    applied = {doc["_id"] async for doc in migrations_collection.find({}, {"_id": 1})}
+    for name, migration in MIGRATIONS:
+        if name in applied:
+            continue
+        modified = await migration()
+        await migrations_collection.update_one(
+            {"_id": name},
+            {"$set": {"applied_at": utc_now(), "modified": modified}},
+            upsert=True
+        )
+        logger.info("Applied migration %s (%d documents changed)", name, modified)
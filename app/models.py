@@ -1,9 +1,13 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, BeforeValidator, ConfigDict, EmailStr, Field, TypeAdapter
+from typing import Annotated, Literal, Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
+import sys
 from bson import ObjectId
 
+# Shared by the models loaded from MongoDB documents, which carry their id as "_id"
+MONGO_MODEL_CONFIG = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True)
+
 class AuthorityBase(BaseModel):
     username: str
     email: EmailStr
@@ -17,8 +21,7 @@ class Authority(AuthorityBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class AuthorityLogin(BaseModel):
     username: str
@@ -47,15 +50,51 @@ class GoogleUser(BaseModel):
     picture: Optional[str] = None
     google_id: str
     
-    class Config:
-        populate_by_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {
-            datetime: lambda v: v.isoformat(),
-            ObjectId: lambda v: str(v)
-        }
+    model_config = MONGO_MODEL_CONFIG
+
+def split_csv(value: Any) -> List[Any]:
+    """
+    Normalize a comma-separated string (the format Gemini returns and older reports
+    were stored in) into a list; lists pass through and a bare number becomes [number]
+    """
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    if isinstance(value, (int, float)):
+        return [value]
+    return value
+
+def parse_confidences(value: Any) -> List[float]:
+    """
+    Normalize Gemini's free-form confidence output into a list of numbers. Tokens
+    may carry a trailing "%"; tokens that still aren't numbers ("high", "") are
+    dropped rather than failing the whole report
+    """
+    confidences = []
+    for item in split_csv(value):
+        if isinstance(item, bool):
+            continue
+        if isinstance(item, (int, float)):
+            confidences.append(float(item))
+            continue
+        try:
+            confidences.append(float(str(item).strip().rstrip("%")))
+        except ValueError:
+            continue
+    return confidences
+
+# List fields that also accept the comma-separated strings
+WasteTypeList = Annotated[List[str], BeforeValidator(split_csv)]
+ConfidenceList = Annotated[List[float], BeforeValidator(parse_confidences)]
+
+# Request/response models built once per request and never modified afterwards;
+# frozen skips assignment validation and unknown keys are dropped without checks
+FROZEN_MODEL_CONFIG = ConfigDict(frozen=True, extra="ignore", revalidate_instances="never")
 
 class WasteReportValidationRequest(BaseModel):
+    model_config = FROZEN_MODEL_CONFIG
+    
     image: str  # Base64 encoded image
     description: Optional[str] = None
     location: str  # Coordinates or address
@@ -95,17 +134,24 @@ class SeverityLevel(str, Enum):
     HIGH = "High"
     CRITICAL = "Critical"
 
+# SeverityLevel values as a Literal: pydantic-core matches these strings directly
+# instead of going through the Enum. Members of the str Enum compare and hash
+# equal to these strings, so the two can be mixed in lookups
+SeverityLiteral = Literal["Clean", "Low", "Medium", "High", "Critical"]
+
 class WasteReportValidationResponse(BaseModel):
+    model_config = FROZEN_MODEL_CONFIG
+    
     is_valid: bool
     message: str
     confidence_score: Optional[float] = None
     
     # Waste Types (flattened)
-    waste_types: str  # Comma-separated list of waste types
-    waste_type_confidences: str  # Comma-separated list of confidence values
+    waste_types: WasteTypeList
+    waste_type_confidences: ConfidenceList  # Confidence for each waste type
     
     # Severity
-    severity: Optional[SeverityLevel] = None
+    severity: Optional[SeverityLiteral] = None
     
     # Dustbins (flattened)
     dustbin_present: bool = False
@@ -133,6 +179,8 @@ class WasteReportValidationResponse(BaseModel):
     additional_data: Optional[Dict[str, Any]] = None
 
 class WasteReportComment(BaseModel):
+    model_config = FROZEN_MODEL_CONFIG
+    
     text: str
     user_id: str
     username: str
@@ -146,17 +194,11 @@ class Badge(BaseModel):
     level: BadgeLevel
     required_reports: int
     image_url: Optional[str] = None
-    rewards: Optional[List[Dict[str, Any]]] = []
+    rewards: Optional[List[Dict[str, Any]]] = Field(default_factory=list)
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     
-    class Config:
-        populate_by_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {
-            datetime: lambda v: v.isoformat(),
-            ObjectId: lambda v: str(v)
-        }
+    model_config = MONGO_MODEL_CONFIG
 
 class UserBadge(BaseModel):
     id: Optional[str] = Field(None, alias="_id")
@@ -168,28 +210,16 @@ class UserBadge(BaseModel):
     claimed: bool = False
     claimed_at: Optional[datetime] = None
     
-    class Config:
-        populate_by_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {
-            datetime: lambda v: v.isoformat(),
-            ObjectId: lambda v: str(v)
-        }
+    model_config = MONGO_MODEL_CONFIG
 
 class UserBadgeStats(BaseModel):
     id: Optional[str] = Field(None, alias="_id")
     user_id: str
     total_reports: int = 0
-    badges_earned: List[str] = []
+    badges_earned: List[str] = Field(default_factory=list)
     updated_at: Optional[datetime] = None
     
-    class Config:
-        populate_by_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {
-            datetime: lambda v: v.isoformat(),
-            ObjectId: lambda v: str(v)
-        }
+    model_config = MONGO_MODEL_CONFIG
 
 class WasteReportStatus(str, Enum):
     PENDING = "pending"
@@ -210,17 +240,29 @@ class CleanupVerification(BaseModel):
     verified_by: Optional[Dict[str, Any]] = None
     verification_timestamp: datetime
 
+class SubmittedBy(BaseModel):
+    """Who submitted a waste report; anonymous reports leave every field unset"""
+    user_id: Optional[str] = None
+    username: Optional[str] = None
+    email: Optional[str] = None
+
+# Normalizers for stored report fields that from_mongo applies without full validation
+_SEVERITY_BY_VALUE = {sys.intern(level.value): level for level in SeverityLevel}
+# Lets every loaded report share one string object per status value
+_STATUS_BY_VALUE = {sys.intern(status.value): sys.intern(status.value) for status in WasteReportStatus}
+_fromisoformat = datetime.fromisoformat
+
 class WasteReport(BaseModel):
     id: Optional[str] = Field(None, alias="_id")
     is_valid: bool
     message: str
-    confidence_score: float
+    confidence_score: Optional[float] = None  # Null on some older reports
     severity: SeverityLevel
     location: str
     description: str
     timestamp: datetime
-    waste_types: str
-    waste_type_confidences: Optional[str] = None
+    waste_types: WasteTypeList  # Older reports store comma-separated strings
+    waste_type_confidences: ConfidenceList = Field(default_factory=list)
     dustbin_present: bool
     dustbin_full: Optional[bool] = None
     dustbin_fullness_percentage: Optional[float] = None
@@ -235,38 +277,96 @@ class WasteReport(BaseModel):
     description_matches_image: bool
     description_match_confidence: Optional[float] = None
     description_match_notes: Optional[str] = None
-    additional_data: Optional[Dict] = {}
-    submitted_by: Optional[Dict] = {}
+    additional_data: Optional[Dict[str, Any]] = Field(default_factory=dict)
+    submitted_by: Optional[SubmittedBy] = None
     status: str = "pending"
-    image: Optional[str] = None  # Base64 encoded image
     cleanup_verification: Optional[CleanupVerification] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
-    class Config:
-        populate_by_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {
-            datetime: lambda v: v.isoformat(),
-            ObjectId: lambda v: str(v)
-        }
+    model_config = MONGO_MODEL_CONFIG
 
     @classmethod
     def from_mongo(cls, data: dict):
-        """Convert MongoDB document to WasteReport model"""
+        """
+        Convert MongoDB document to WasteReport model
+        
+        Stored reports were validated when written, so the model is built with
+        model_construct; only the conversions validation would have done are applied.
+        A document missing a required field goes through full validation instead,
+        so it fails with a ValidationError rather than producing a model without
+        that attribute. Use from_mongo_validated to re-check any document.
+        """
         if not data:
             return None
             
-        # Convert _id to string if it exists
-        if "_id" in data:
-            data["_id"] = str(data["_id"])
+        # Move _id to the id field, converting it to string if it is still an
+        # ObjectId. Reports carry no nested ObjectIds, so this is the only one
+        object_id = data.pop("_id", None)
+        if object_id is not None:
+            data["id"] = str(object_id) if type(object_id) is ObjectId else object_id
             
         # Convert timestamp to datetime if it's a string
-        if "timestamp" in data and isinstance(data["timestamp"], str):
-            data["timestamp"] = datetime.fromisoformat(data["timestamp"])
+        timestamp = data.get("timestamp")
+        if type(timestamp) is str:
+            data["timestamp"] = _fromisoformat(timestamp)
+        
+        # Older reports store comma-separated strings; severity is stored as its value
+        data["waste_types"] = split_csv(data.get("waste_types"))
+        data["waste_type_confidences"] = parse_confidences(data.get("waste_type_confidences"))
+        severity = data.get("severity")
+        data["severity"] = _SEVERITY_BY_VALUE.get(severity, severity)
+        status = data.get("status")
+        if status is not None:
+            data["status"] = _STATUS_BY_VALUE.get(status, status)
+        submitted_by = data.get("submitted_by")
+        if type(submitted_by) is dict:
+            # An empty submitter is stored for some anonymous reports
+            data["submitted_by"] = SubmittedBy.model_construct(**submitted_by) if submitted_by else None
+            
+        if not _WASTE_REPORT_REQUIRED_FIELDS <= data.keys():
+            return cls.model_validate(data)
+        return cls.model_construct(**data)
+
+    @classmethod
+    def load_many(cls, docs: List[dict]) -> List["WasteReport"]:
+        """Convert a batch of MongoDB documents to WasteReport models"""
+        from_mongo = cls.from_mongo
+        return [from_mongo(doc) for doc in docs]
+
+    @classmethod
+    def from_mongo_validated(cls, data: dict):
+        """Convert MongoDB document to WasteReport model, running full validation"""
+        if not data:
+            return None
+            
+        if type(data.get("_id")) is ObjectId:
+            data["_id"] = str(data["_id"])
             
         return cls(**data)
 
+# Fields model_construct can't fill in; from_mongo validates documents missing any of them
+_WASTE_REPORT_REQUIRED_FIELDS = frozenset(
+    name for name, field in WasteReport.model_fields.items() if field.is_required()
+)
+
+# Serializes a whole page of reports in one call instead of one model_dump per report
+WasteReportList = TypeAdapter(List[WasteReport])
+
+class WasteReportSummary(BaseModel):
+    """The fields a report list page shows; loaded with a matching MongoDB projection"""
+    id: Optional[str] = Field(None, alias="_id")
+    severity: SeverityLevel
+    status: str = "pending"
+    location: str
+    timestamp: datetime
+    waste_types: WasteTypeList
+    confidence_score: Optional[float] = None
+
+    model_config = ConfigDict(populate_by_name=True)
+
+WasteReportSummaryList = TypeAdapter(List[WasteReportSummary])
+
 class CleanupVerificationResponse(BaseModel):
     """Simplified response model for cleanup verification"""
     status: str  # "verified", "not_clean", or "location_mismatch"
@@ -283,12 +383,7 @@ class DigitalWallet(BaseModel):
     total_earned: int
     total_spent: int
 
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat(),
-            ObjectId: lambda v: str(v)
-        }
-        arbitrary_types_allowed = True
+    model_config = ConfigDict(arbitrary_types_allowed=True)
 
 class EcoCoinTransaction(BaseModel):
     id: str
@@ -301,12 +396,7 @@ class EcoCoinTransaction(BaseModel):
     benefit_details: Optional[Dict[str, Any]] = None
     validity_days: Optional[int] = None
 
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat(),
-            ObjectId: lambda v: str(v)
-        }
-        arbitrary_types_allowed = True
+    model_config = ConfigDict(arbitrary_types_allowed=True)
 
 class Benefit(BaseModel):
     id: str
@@ -315,12 +405,7 @@ class Benefit(BaseModel):
     description: str
     validity_days: int
     
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat(),
-            ObjectId: lambda v: str(v)
-        }
-        arbitrary_types_allowed = True
+    model_config = ConfigDict(arbitrary_types_allowed=True)
 
 class PickupRequest(BaseModel):
     id: Optional[str] = None
@@ -333,12 +418,7 @@ class PickupRequest(BaseModel):
     updated_at: datetime = None
     notes: Optional[str] = None
     
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat(),
-            ObjectId: lambda v: str(v)
-        }
-        arbitrary_types_allowed = True
+    model_config = ConfigDict(arbitrary_types_allowed=True)
 
 class CityStats(BaseModel):
     id: Optional[str] = None
@@ -355,24 +435,14 @@ class CityStats(BaseModel):
     total_score: Optional[float] = None  # overall score
     last_updated: datetime = None
     
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat(),
-            ObjectId: lambda v: str(v)
-        }
-        arbitrary_types_allowed = True
+    model_config = ConfigDict(arbitrary_types_allowed=True)
 
 class CityLeaderboard(BaseModel):
     cities: List[Dict[str, Any]]
     last_updated: datetime
     scoring_explanation: Optional[Dict[str, str]] = None
     
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat(),
-            ObjectId: lambda v: str(v)
-        }
-        arbitrary_types_allowed = True
+    model_config = ConfigDict(arbitrary_types_allowed=True)
 
 class UpdateCityRequest(BaseModel):
     city: str
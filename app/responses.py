@@ -0,0 +1,14 @@
+import orjson
+from fastapi.responses import JSONResponse
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson, bypassing FastAPI's jsonable_encoder.
+    
+    Handlers pass plain data (e.g. model_dump() output); datetimes and enums are
+    serialized natively and anything else (e.g. ObjectId) falls back to str.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
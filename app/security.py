@@ -1,4 +1,7 @@
-from datetime import datetime, timedelta
+import asyncio
+import os
+from datetime import timedelta
+from .database import utc_now
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -15,13 +18,27 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+# bcrypt is CPU-bound and releases the GIL, so hashes run in worker threads;
+# the semaphore caps concurrent hashes at the number of cores
+_hash_semaphore = asyncio.Semaphore(os.cpu_count() or 1)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash without blocking the event loop"""
+    async with _hash_semaphore:
+        return await asyncio.to_thread(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    async with _hash_semaphore:
+        return await asyncio.to_thread(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = utc_now() + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
+        expire = utc_now() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
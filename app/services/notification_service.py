@@ -1,7 +1,9 @@
 from twilio.rest import Client
 from ..config import get_settings
+from functools import lru_cache
 import logging
 from datetime import datetime
+from ..database import utc_now
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
@@ -26,11 +28,13 @@ class NotificationService:
             # Extract key information
             severity = report_data.get("severity", "Unknown")
             location = report_data.get("location", "Unknown location")
-            waste_types = report_data.get("waste_types", "Unknown types")
+            waste_types = report_data.get("waste_types") or "Unknown types"
+            if isinstance(waste_types, list):
+                waste_types = ", ".join(waste_types)
             confidence = report_data.get("confidence_score", 0)
             
             # Format timestamp
-            timestamp = report_data.get("timestamp", datetime.utcnow())
+            timestamp = report_data.get("timestamp", utc_now())
             if isinstance(timestamp, str):
                 timestamp = datetime.fromisoformat(timestamp)
             formatted_time = timestamp.strftime("%H:%M %d/%m")
@@ -44,9 +48,11 @@ class NotificationService:
                 f"📊 {confidence:.0f}% conf"
             )
             
-            # Send the message
+            # Send the message. The Twilio client is blocking, so the request runs in a
+            # worker thread instead of stalling the event loop for the round trip
             #Currently disabled
-            # self.client.messages.create(
+            # await asyncio.to_thread(
+            #     self.client.messages.create,
             #     body=message,
             #     from_=self.from_number,
             #     to=self.admin_number
@@ -59,5 +65,7 @@ class NotificationService:
             logger.error(f"Failed to send SMS alert: {str(e)}")
             return False
 
-# Create a singleton instance
-notification_service = NotificationService() 
\ No newline at end of file
+# One shared instance (and Twilio client) per process, created on first use
+@lru_cache()
+def get_notification_service():
+    return NotificationService() 
\ No newline at end of file
@@ -1,31 +1,47 @@
 import os
 import base64
-import httpx
+import copy
+import hashlib
+from cachetools import TTLCache
 from datetime import datetime
+from types import MappingProxyType
 from typing import Dict, Any
 from app.config import get_settings
+from app.services.gemini_service import (
+    GEMINI_GENERATION_CONFIG,
+    image_content_part,
+    optimize_image_for_gemini,
+    post_to_gemini,
+    strip_code_fence,
+    strip_data_url_prefix
+)
 import logging
-import json
+import orjson
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
-async def analyze_waste_image(image: str) -> Dict[str, Any]:
-    """
-    Analyze a waste image to categorize waste types and determine recyclability
-    
-    Args:
-        image: Base64 encoded image string
-        
-    Returns:
-        Dict containing waste categorization and recyclability analysis
-    """
-    # Ensure the image is properly formatted for Gemini
-    if "base64," in image:
-        image = image.split("base64,")[1]
-    
-    # Construct the prompt for Gemini
-    prompt = """
+# Analyses of recently categorized images, keyed by a digest of the image, so repeat
+# uploads and retries of the same photo don't repeat the API call
+CATEGORIZATION_CACHE_TTL = 24 * 3600
+_categorization_cache = TTLCache(maxsize=2048, ttl=CATEGORIZATION_CACHE_TTL)
+
+# Filled in for any field a parsed Gemini answer leaves out; shared, so treat as read-only
+CATEGORIZATION_RESULT_DEFAULTS = MappingProxyType({
+    "main_category": "UNKNOWN",
+    "main_category_confidence": 0,
+    "waste_categories": [],
+    "overall_analysis": {
+        "total_recyclable_percentage": 0,
+        "primary_material": "Unknown",
+        "recycling_recommendation": "Not analyzed",
+        "environmental_notes": "Not analyzed"
+    },
+    "confidence_score": 0
+})
+
+# Categorization prompt; it has no per-request parts
+CATEGORIZATION_PROMPT = """
     Analyze this image of waste and provide detailed categorization and recyclability information.
     
     Instructions:
@@ -72,14 +88,32 @@ async def analyze_waste_image(image: str) -> Dict[str, Any]:
         "confidence_score": 0-100
     }
     """
+
+async def analyze_waste_image(image: str) -> Dict[str, Any]:
+    """
+    Analyze a waste image to categorize waste types and determine recyclability
     
-    # Construct the request to Gemini
-    model = "gemini-2.0-flash"
-    api_url = f"https://generativelanguage.googleapis.com/v1/models/{model}:generateContent"
-    headers = {
-        "Content-Type": "application/json",
-        "x-goog-api-key": settings.GOOGLE_API_KEY
-    }
+    Args:
+        image: Base64 encoded image string
+        
+    Returns:
+        Dict containing waste categorization and recyclability analysis
+    """
+    # Ensure the image is properly formatted for Gemini
+    image = strip_data_url_prefix(image)
+    
+    # Return a cached analysis of the same image; the base64 text identifies the
+    # image as well as its bytes would, without decoding it
+    cache_key = hashlib.blake2b(image.encode(), digest_size=16).digest()
+    cached_result = _categorization_cache.get(cache_key)
+    if cached_result is not None:
+        logger.debug("Returning cached categorization result")
+        return copy.deepcopy(cached_result)
+    
+    # Downscale large photos before they are sent
+    image = await optimize_image_for_gemini(image)
+    
+    prompt = CATEGORIZATION_PROMPT
     
     data = {
         "contents": [
@@ -87,114 +121,81 @@ async def analyze_waste_image(image: str) -> Dict[str, Any]:
                 "role": "user",
                 "parts": [
                     {"text": prompt},
-                    {
-                        "inline_data": {
-                            "mime_type": "image/jpeg",
-                            "data": image
-                        }
-                    }
+                    # Large images go through the Files API and are sent as a URI
+                    await image_content_part(image)
                 ]
             }
         ],
-        "generationConfig": {
-            "temperature": 0.2,
-            "topK": 32,
-            "topP": 0.95,
-            "maxOutputTokens": 4096,
-        }
+        "generationConfig": GEMINI_GENERATION_CONFIG
     }
     
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(api_url, json=data, headers=headers)
-            
-            if response.status_code != 200:
-                error_detail = f"Gemini API error: {response.status_code} - {response.text}"
-                logger.error(error_detail)
-                return {
-                    "error": error_detail,
-                    "main_category": "UNKNOWN",
-                    "main_category_confidence": 0,
-                    "waste_categories": [],
-                    "overall_analysis": {
-                        "total_recyclable_percentage": 0,
-                        "primary_material": "Unknown",
-                        "recycling_recommendation": "Unable to analyze",
-                        "environmental_notes": "Analysis failed"
-                    },
-                    "confidence_score": 0
-                }
-            
-            response.raise_for_status()
-            result = response.json()
-            
-            # Extract the text from the response
-            response_text = result.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "{}")
+        response = await post_to_gemini(orjson.dumps(data))
+        
+        if response.status_code != 200:
+            error_detail = f"Gemini API error: {response.status_code} - {response.text}"
+            logger.error(error_detail)
+            return {
+                "error": error_detail,
+                "main_category": "UNKNOWN",
+                "main_category_confidence": 0,
+                "waste_categories": [],
+                "overall_analysis": {
+                    "total_recyclable_percentage": 0,
+                    "primary_material": "Unknown",
+                    "recycling_recommendation": "Unable to analyze",
+                    "environmental_notes": "Analysis failed"
+                },
+                "confidence_score": 0
+            }
+        
+        response.raise_for_status()
+        result = orjson.loads(response.content)
+        
+        # Extract the text from the response
+        response_text = result.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "{}")
+        
+        # Log the raw response for debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Raw Gemini response: %s...", response_text[:500])
+        
+        # Clean up the response text, removing a markdown code block if present
+        cleaned_text = strip_code_fence(response_text)
+        
+        # Try to parse the JSON
+        try:
+            analysis_result = orjson.loads(cleaned_text)
             
-            # Log the raw response for debugging
-            logger.debug(f"Raw Gemini response: {response_text[:500]}...")
+            # Validate the structure
+            if not isinstance(analysis_result, dict):
+                raise ValueError("Response is not a JSON object")
             
-            # Clean up the response text
-            cleaned_text = response_text.strip()
+            # Ensure required fields are present
+            analysis_result = {**CATEGORIZATION_RESULT_DEFAULTS, **analysis_result}
             
-            # Remove any markdown code blocks if present
-            if cleaned_text.startswith("```json"):
-                cleaned_text = cleaned_text.split("```json", 1)[1]
-                if "```" in cleaned_text:
-                    cleaned_text = cleaned_text.split("```", 1)[0]
-            elif cleaned_text.startswith("```"):
-                cleaned_text = cleaned_text.split("```", 1)[1]
-                if "```" in cleaned_text:
-                    cleaned_text = cleaned_text.split("```", 1)[0]
+            # Cache a copy so callers can't mutate the stored result
+            _categorization_cache[cache_key] = copy.deepcopy(analysis_result)
+            return analysis_result
             
-            cleaned_text = cleaned_text.strip()
+        except orjson.JSONDecodeError as e:
+            logger.error("JSON parsing error: %s", e)
+            logger.error("Cleaned text that failed to parse: %s...", cleaned_text[:500])
+            return {
+                "error": f"Failed to parse JSON response: {str(e)}",
+                "main_category": "UNKNOWN",
+                "main_category_confidence": 0,
+                "waste_categories": [],
+                "overall_analysis": {
+                    "total_recyclable_percentage": 0,
+                    "primary_material": "Unknown",
+                    "recycling_recommendation": "Unable to analyze",
+                    "environmental_notes": "Analysis failed"
+                },
+                "confidence_score": 0
+            }
             
-            # Try to parse the JSON
-            try:
-                analysis_result = json.loads(cleaned_text)
-                
-                # Validate the structure
-                if not isinstance(analysis_result, dict):
-                    raise ValueError("Response is not a JSON object")
-                
-                # Ensure required fields are present
-                if "main_category" not in analysis_result:
-                    analysis_result["main_category"] = "UNKNOWN"
-                if "main_category_confidence" not in analysis_result:
-                    analysis_result["main_category_confidence"] = 0
-                if "waste_categories" not in analysis_result:
-                    analysis_result["waste_categories"] = []
-                if "overall_analysis" not in analysis_result:
-                    analysis_result["overall_analysis"] = {
-                        "total_recyclable_percentage": 0,
-                        "primary_material": "Unknown",
-                        "recycling_recommendation": "Not analyzed",
-                        "environmental_notes": "Not analyzed"
-                    }
-                if "confidence_score" not in analysis_result:
-                    analysis_result["confidence_score"] = 0
-                
-                return analysis_result
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON parsing error: {str(e)}")
-                logger.error(f"Cleaned text that failed to parse: {cleaned_text[:500]}...")
-                return {
-                    "error": f"Failed to parse JSON response: {str(e)}",
-                    "main_category": "UNKNOWN",
-                    "main_category_confidence": 0,
-                    "waste_categories": [],
-                    "overall_analysis": {
-                        "total_recyclable_percentage": 0,
-                        "primary_material": "Unknown",
-                        "recycling_recommendation": "Unable to analyze",
-                        "environmental_notes": "Analysis failed"
-                    },
-                    "confidence_score": 0
-                }
-                
     except Exception as e:
-        logger.error(f"Error analyzing waste image: {str(e)}")
+        logger.exception("Error analyzing waste image: %s", e)
         return {
             "error": str(e),
             "main_category": "UNKNOWN",
@@ -0,0 +1,13 @@
+import os
+
+# Settings are read when app modules are imported; give the required ones
+# placeholder values so the modules import without a .env file. Nothing here
+# connects to MongoDB or calls an external API
+for name, value in {
+    "MONGO_URI": "mongodb://localhost:27017",
+    "SECRET_KEY": "test-secret",
+    "GOOGLE_CLIENT_ID": "test-client-id",
+    "GOOGLE_CLIENT_SECRET": "test-client-secret",
+    "GOOGLE_API_KEY": "test-api-key",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,77 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services import gemini_service
+
+
+class FakeClient:
+    """Stands in for gemini_client, answering each post with the next queued outcome"""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def post(self, url, content, headers):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome)
+
+    async def get(self, url, headers):
+        await asyncio.sleep(60)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(gemini_service.asyncio, "sleep", fake_sleep)
+    return delays
+
+
+def run_post(monkeypatch, outcomes):
+    client = FakeClient(outcomes)
+    monkeypatch.setattr(gemini_service, "gemini_client", client)
+    return client, asyncio.run(gemini_service.post_to_gemini(b"{}"))
+
+
+def test_retries_retryable_status_then_succeeds(monkeypatch, sleeps):
+    client, response = run_post(monkeypatch, [503, 429, 200])
+    assert response.status_code == 200
+    assert client.calls == 3
+    assert len(sleeps) == 2
+    for attempt, delay in enumerate(sleeps):
+        cap = min(gemini_service.GEMINI_RETRY_MAX_DELAY, gemini_service.GEMINI_RETRY_BASE_DELAY * 2 ** attempt)
+        assert 0 <= delay <= cap
+
+
+def test_non_retryable_status_returned_immediately(monkeypatch, sleeps):
+    client, response = run_post(monkeypatch, [400])
+    assert response.status_code == 400
+    assert client.calls == 1
+    assert sleeps == []
+
+
+def test_last_retryable_status_is_returned(monkeypatch, sleeps):
+    client, response = run_post(monkeypatch, [503] * gemini_service.GEMINI_MAX_ATTEMPTS)
+    assert response.status_code == 503
+    assert client.calls == gemini_service.GEMINI_MAX_ATTEMPTS
+
+
+def test_connection_errors_are_retried_then_raised(monkeypatch, sleeps):
+    error = httpx.ConnectError("refused")
+    with pytest.raises(httpx.ConnectError):
+        run_post(monkeypatch, [error] * gemini_service.GEMINI_MAX_ATTEMPTS)
+    assert len(sleeps) == gemini_service.GEMINI_MAX_ATTEMPTS - 1
+
+
+def test_warm_up_gives_up_after_timeout(monkeypatch):
+    monkeypatch.setattr(gemini_service, "gemini_client", FakeClient([]))
+    monkeypatch.setattr(gemini_service, "GEMINI_WARMUP_TIMEOUT", 0.01)
+    asyncio.run(gemini_service.warm_gemini_client())
@@ -0,0 +1,129 @@
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+from pydantic import ValidationError
+
+from app.models import (
+    SeverityLevel,
+    SubmittedBy,
+    WasteReport,
+    WasteReportSummary,
+    WasteReportValidationResponse,
+    parse_confidences,
+    split_csv,
+)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, []),
+    ("", []),
+    ("plastic, glass ,,metal", ["plastic", "glass", "metal"]),
+    (["plastic", "glass"], ["plastic", "glass"]),
+    (0.8, [0.8]),
+])
+def test_split_csv(value, expected):
+    assert split_csv(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("0.8, 0.15", [0.8, 0.15]),
+    ("0.8%, 95 %", [0.8, 95.0]),
+    ("high, 0.4, ", [0.4]),
+    ("", []),
+    (None, []),
+    (0.7, [0.7]),
+    ([0.5, "0.25", "n/a", True], [0.5, 0.25]),
+])
+def test_parse_confidences(value, expected):
+    assert parse_confidences(value) == expected
+
+
+def test_validation_response_coerces_gemini_strings():
+    response = WasteReportValidationResponse(
+        is_valid=True,
+        message="ok",
+        waste_types="plastic, organic",
+        waste_type_confidences="0.8%, high, 0.6",
+        recyclable_items="bottles",
+    )
+    assert response.waste_types == ["plastic", "organic"]
+    assert response.waste_type_confidences == [0.8, 0.6]
+
+
+def make_report_doc(**overrides):
+    doc = {
+        "_id": ObjectId(),
+        "is_valid": True,
+        "message": "Valid report",
+        "confidence_score": 90.0,
+        "severity": "High",
+        "location": "Pune",
+        "description": "Overflowing bin",
+        "timestamp": datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+        "waste_types": ["plastic"],
+        "waste_type_confidences": [0.9],
+        "dustbin_present": True,
+        "recyclable_items": "bottles",
+        "is_recyclable": True,
+        "time_appears_valid": True,
+        "description_matches_image": True,
+    }
+    doc.update(overrides)
+    return doc
+
+
+def test_from_mongo_normalizes_stored_fields():
+    doc = make_report_doc(
+        timestamp="2024-05-01T12:30:00+00:00",
+        waste_types="plastic, glass",
+        waste_type_confidences="0.8, high",
+        submitted_by={"user_id": "u1", "username": "asha"},
+    )
+    object_id = doc["_id"]
+
+    report = WasteReport.from_mongo(doc)
+
+    assert report.id == str(object_id)
+    assert report.timestamp == datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    assert report.waste_types == ["plastic", "glass"]
+    assert report.waste_type_confidences == [0.8]
+    assert report.severity is SeverityLevel.HIGH
+    assert isinstance(report.submitted_by, SubmittedBy)
+    assert report.submitted_by.email is None
+    assert report.status == "pending"
+
+
+def test_from_mongo_treats_empty_submitter_as_anonymous():
+    report = WasteReport.from_mongo(make_report_doc(submitted_by={}))
+    assert report.submitted_by is None
+
+
+def test_from_mongo_validates_documents_missing_required_fields():
+    doc = make_report_doc()
+    del doc["location"]
+    with pytest.raises(ValidationError):
+        WasteReport.from_mongo(doc)
+
+
+def test_from_mongo_empty_document():
+    assert WasteReport.from_mongo({}) is None
+
+
+def test_from_mongo_accepts_null_confidence_score():
+    report = WasteReport.from_mongo(make_report_doc(confidence_score=None))
+    assert report.confidence_score is None
+    # FastAPI re-validates the model for response_model routes
+    assert WasteReport.model_validate(report.model_dump(by_alias=True)).confidence_score is None
+
+
+def test_summary_accepts_null_confidence_score():
+    summary = WasteReportSummary.model_validate({
+        "_id": str(ObjectId()),
+        "severity": "Low",
+        "location": "Pune",
+        "timestamp": datetime(2024, 5, 1, tzinfo=timezone.utc),
+        "waste_types": "plastic",
+        "confidence_score": None,
+    })
+    assert summary.confidence_score is None
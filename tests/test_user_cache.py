@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.crud import user as user_crud
+
+
+class FakeUsersCollection:
+    """In-memory stand-in for users_collection covering the calls user_crud makes"""
+
+    def __init__(self, *docs):
+        self.docs = {doc["_id"]: dict(doc) for doc in docs}
+        self.finds = 0
+
+    def _match(self, query):
+        for doc in self.docs.values():
+            if all(doc.get(key) == value for key, value in query.items()):
+                return doc
+        return None
+
+    async def find_one(self, query, projection=None):
+        self.finds += 1
+        doc = self._match(query)
+        if not doc:
+            return None
+        if projection:
+            return {key: doc[key] for key in ("_id", *projection) if key in doc}
+        return dict(doc)
+
+    async def find_one_and_update(self, query, update, return_document):
+        doc = self._match(query)
+        if not doc:
+            return None
+        previous = dict(doc)
+        doc.update(update["$set"])
+        return dict(doc) if return_document is ReturnDocument.AFTER else previous
+
+    async def find_one_and_delete(self, query, projection):
+        doc = self._match(query)
+        if not doc:
+            return None
+        del self.docs[doc["_id"]]
+        return {"_id": doc["_id"], "email": doc["email"]}
+
+
+USER_ID = ObjectId()
+
+
+@pytest.fixture
+def users(monkeypatch):
+    collection = FakeUsersCollection(
+        {"_id": USER_ID, "email": "old@example.com", "name": "Asha", "prefs": {"alerts": True}}
+    )
+    monkeypatch.setattr(user_crud, "users_collection", collection)
+    user_crud._user_cache.clear()
+    yield collection
+    user_crud._user_cache.clear()
+
+
+def test_lookups_are_cached_under_id_and_email(users):
+    asyncio.run(user_crud.get_user_by_id(str(USER_ID)))
+    user = asyncio.run(user_crud.get_user_by_email("old@example.com"))
+    assert user["name"] == "Asha"
+    assert users.finds == 1
+
+
+def test_callers_get_deep_copies(users):
+    user = asyncio.run(user_crud.get_user_by_id(str(USER_ID)))
+    user["name"] = "changed"
+    user["prefs"]["alerts"] = False
+
+    cached = asyncio.run(user_crud.get_user_by_id(str(USER_ID)))
+    assert cached["name"] == "Asha"
+    assert cached["prefs"] == {"alerts": True}
+
+
+def test_update_evicts_old_and_new_email(users):
+    asyncio.run(user_crud.get_user_by_id(str(USER_ID)))
+    # A stale entry under the new email must not survive the change either
+    user_crud._user_cache[("email", "new@example.com")] = {"id": "stale"}
+
+    updated = asyncio.run(user_crud.update_user(str(USER_ID), {"email": "new@example.com"}))
+
+    assert updated["email"] == "new@example.com"
+    assert updated["name"] == "Asha"
+    assert ("id", str(USER_ID)) not in user_crud._user_cache
+    assert ("email", "old@example.com") not in user_crud._user_cache
+    assert ("email", "new@example.com") not in user_crud._user_cache
+    assert asyncio.run(user_crud.get_user_by_email("old@example.com")) == {}
+    assert asyncio.run(user_crud.get_user_by_email("new@example.com"))["id"] == str(USER_ID)
+
+
+def test_update_evicts_email_after_id_entry_expired(users):
+    asyncio.run(user_crud.get_user_by_email("old@example.com"))
+    user_crud._user_cache.pop(("id", str(USER_ID)))
+
+    asyncio.run(user_crud.update_user(str(USER_ID), {"name": "Asha K"}))
+
+    assert ("email", "old@example.com") not in user_crud._user_cache
+    assert asyncio.run(user_crud.get_user_by_email("old@example.com"))["name"] == "Asha K"
+
+
+def test_update_returns_stored_document(users):
+    # A concurrent write the caller's update doesn't mention must still show up
+    users.docs[USER_ID]["picture"] = "new.png"
+
+    updated = asyncio.run(user_crud.update_user(str(USER_ID), {"name": "Asha K"}))
+
+    assert updated["picture"] == "new.png"
+    assert updated["name"] == "Asha K"
+    assert updated["id"] == str(USER_ID)
+
+
+def test_delete_evicts_cached_user(users):
+    asyncio.run(user_crud.get_user_by_id(str(USER_ID)))
+
+    assert asyncio.run(user_crud.delete_user(str(USER_ID))) is True
+    assert ("id", str(USER_ID)) not in user_crud._user_cache
+    assert ("email", "old@example.com") not in user_crud._user_cache
+    assert asyncio.run(user_crud.delete_user(str(USER_ID))) is False
@@ -0,0 +1,76 @@
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+from app.crud.waste_report import NULL_CONFIDENCE, _cursor_query, encode_report_cursor
+
+REPORT_ID = ObjectId()
+TIMESTAMP = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+
+
+def make_report(**overrides):
+    report = {
+        "id": str(REPORT_ID),
+        "timestamp": TIMESTAMP,
+        "severity_rank": 4,
+        "confidence_score": 87.5,
+    }
+    report.update(overrides)
+    return report
+
+
+def test_cursor_round_trips_sort_values():
+    query = _cursor_query(encode_report_cursor(make_report()))
+    last = query["$or"][-1]
+    assert last["timestamp"] == TIMESTAMP
+    assert last["severity_rank"] == 4
+    assert last["confidence_score"] == 87.5
+    assert last["_id"] == {"$lt": REPORT_ID}
+
+
+def test_integer_confidence_round_trips():
+    query = _cursor_query(encode_report_cursor(make_report(confidence_score=90)))
+    assert query["$or"][-1]["confidence_score"] == 90.0
+
+
+@pytest.mark.parametrize("report", [make_report(confidence_score=None), {
+    key: value for key, value in make_report().items() if key != "confidence_score"
+}])
+def test_null_or_missing_confidence_uses_sentinel(report):
+    cursor = encode_report_cursor(report)
+    assert cursor.split("|")[2] == NULL_CONFIDENCE
+    
+    # Only later null-confidence reports follow a null-confidence cursor
+    clauses = _cursor_query(cursor)["$or"]
+    assert clauses[2:] == [{
+        "timestamp": TIMESTAMP,
+        "severity_rank": 4,
+        "confidence_score": None,
+        "_id": {"$lt": REPORT_ID},
+    }]
+
+
+def test_numeric_cursor_also_matches_null_confidence():
+    clauses = _cursor_query(encode_report_cursor(make_report()))["$or"]
+    assert {"timestamp": TIMESTAMP, "severity_rank": 4, "confidence_score": None} in clauses
+
+
+@pytest.mark.parametrize("report", [
+    make_report(timestamp="2024-05-01T12:30:00"),
+    make_report(confidence_score="high"),
+    {key: value for key, value in make_report().items() if key != "severity_rank"},
+])
+def test_unencodable_reports_give_no_cursor(report):
+    assert encode_report_cursor(report) is None
+
+
+@pytest.mark.parametrize("cursor", [
+    "garbage",
+    "2024-05-01T12:30:00+00:00|4|None|" + str(REPORT_ID),
+    "2024-05-01T12:30:00+00:00|four|87.5|" + str(REPORT_ID),
+    "2024-05-01T12:30:00+00:00|4|87.5|not-an-id",
+])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        _cursor_query(cursor)